@@ -0,0 +1,65 @@
+import argparse
+import sys
+import time
+import numpy as np
+from argparse import ArgumentParser
+from src.contour_calculation.contour_fragments import ContourFragments
+from src.contour_calculation.loop_closer import merge_loop_fragments
+from src.spacial.table_dimention import Table_Dimention
+
+DEFAULT_NUM_FRAGMENTS = [10, 100, 1000, 10000, 100000]
+
+# Vertices in the arc of each fragment
+ARC_VERTICES = 8
+
+
+def get_bump_fragments(num_fragments: int) -> tuple[ContourFragments, Table_Dimention]:
+    """
+    Makes a row of bumps along the bottom of the table. Each bump is an open
+    fragment that starts and stops on the border, so every one of them has to
+    be joined along the border into its own loop
+    """
+    table_dim = Table_Dimention(2 * num_fragments + 1, 10)
+
+    angles = np.linspace(np.pi, 0, ARC_VERTICES)
+    arc = np.stack((np.cos(angles) * 0.5 + 0.5, np.sin(angles)), axis=1)
+    # Make sure the ends are exactly on the border
+    arc[[0, -1], 1] = 0
+
+    x_offsets = np.arange(num_fragments, dtype=np.float64) * 2 + 0.5
+    vertices = np.tile(arc, (num_fragments, 1))
+    vertices[:, 0] += np.repeat(x_offsets, ARC_VERTICES)
+    offsets = np.arange(num_fragments + 1, dtype=np.intp) * ARC_VERTICES
+
+    return ContourFragments(vertices, offsets, np.zeros(num_fragments, dtype=np.bool_)), table_dim
+
+
+class Arguments(argparse.Namespace):
+    num_fragments: list
+    repeat: int
+
+
+def main(argsv):
+    parser = ArgumentParser(prog='benchmark_merge_loop_fragments', description='Time merge_loop_fragments as the number of open fragments grows')
+    parser.add_argument('num_fragments', type=int, nargs='*', default=DEFAULT_NUM_FRAGMENTS, help='The numbers of fragments to time')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='The number of times to run each size. The fastest run is reported')
+    args: Arguments = parser.parse_args(argsv)
+
+    print("{:>10} {:>12} {:>14}".format("fragments", "seconds", "us/fragment"))
+    for num_fragments in args.num_fragments:
+        fragments, table_dim = get_bump_fragments(num_fragments)
+        best_time_s = float("inf")
+        for _ in range(args.repeat):
+            start_time_s = time.perf_counter()
+            contour_loops = merge_loop_fragments(fragments, table_dim)
+            best_time_s = min(best_time_s, time.perf_counter() - start_time_s)
+        if len(contour_loops) != num_fragments:
+            print("Expected {} loops, got {}".format(num_fragments, len(contour_loops)))
+            return 1
+        print("{:>10} {:>12.4f} {:>14.2f}".format(num_fragments, best_time_s, best_time_s / num_fragments * 1e6))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -20,6 +20,13 @@ class Arguments(argparse.Namespace):
     output: str
     num_contours: int
     debug_dir: str
+    samples_per_mm: float
+    native_hgt: bool
+    cache_dir: str
+    elevation_dtype: str
+    water_store: str
+    workers: int
+    stream: bool
     
 
 def parse_table_dimentions(dimention: str) -> Table_Dimention:
@@ -52,13 +59,20 @@ def main(argsv):
     parser.add_argument('-r', '--rotation', type=int, choices=[0, 90, 180, 270], default=0, help='How to rotate the map in degress counter-clockwise')
     parser.add_argument('-d', '--debug-dir', type=str, default=None, help='A directory to write debug file to')
     parser.add_argument('-n', '--num-contours', type=int, default=30, help='The number of elevation contours to use')
+    parser.add_argument('-s', '--samples-per-mm', type=float, default=None, help='Decimate the elevation data to at most this many samples per millimeter of table')
+    parser.add_argument('--native-hgt', action='store_true', help='Read .hgt files directly with a memory map instead of through GDAL')
+    parser.add_argument('-c', '--cache-dir', type=str, default=None, help='A directory to cache cropped elevation data in')
+    parser.add_argument('--elevation-dtype', type=str, choices=['int16', 'float32', 'float64'], default=None, help='The dtype to keep elevation data in. Defaults to the dtype of the input data')
+    parser.add_argument('-w', '--water-store', type=str, default=None, help='A local water store to look up lakes in, instead of OpenStreetMap')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='The number of workers to contour elevation levels and find loop transitions with')
+    parser.add_argument('--stream', action='store_true', help='Generate and write the path in chunks, instead of holding all of it in memory')
     args: Arguments = parser.parse_args(argsv)
     
     bbox = GeoBoundingBox(
         args.lat_0, args.lon_0, args.lat_1, args.lon_1
     )
 
-    convert_geography_to_gcode(bbox, args.table_dim, args.rotation, args.topography, args.output, num_contours=args.num_contours, debug_file_dir=args.debug_dir)
+    convert_geography_to_gcode(bbox, args.table_dim, args.rotation, args.topography, args.output, num_contours=args.num_contours, debug_file_dir=args.debug_dir, samples_per_mm=args.samples_per_mm, native_hgt=args.native_hgt, cache_dir=args.cache_dir, elevation_dtype=args.elevation_dtype, water_store_path=args.water_store, workers=args.workers, stream=args.stream)
     
     return 0
 
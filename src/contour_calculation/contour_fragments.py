@@ -0,0 +1,53 @@
+from __future__ import annotations
+import numpy as np
+import numpy.typing as npt
+from matplotlib.path import Path
+from typing import List
+
+
+class ContourFragments:
+    """
+    The contour lines of a single level, in one vertex buffer. Fragment i is
+    vertices[offsets[i]:offsets[i + 1]]. A closed fragment is a loop whose
+    last vertex repeats its first. Open fragments start and end on the border
+    of the table
+    """
+    def __init__(self, vertices: npt.NDArray[np.float64], offsets: npt.NDArray[np.intp], closed: npt.NDArray[np.bool_]):
+        self.vertices = vertices
+        self.offsets = offsets
+        self.closed = closed
+
+    @staticmethod
+    def from_lines(vertices: npt.NDArray[np.float64], offsets: npt.NDArray[np.intp]) -> ContourFragments:
+        """
+        Finds which lines are closed, all at once
+        """
+        starts = vertices[offsets[:-1]]
+        stops = vertices[offsets[1:] - 1]
+        # Same tolerances as np.allclose
+        closed = np.isclose(starts, stops).all(axis=1)
+        return ContourFragments(vertices, offsets, closed)
+
+    @staticmethod
+    def from_paths(paths: List[Path]) -> ContourFragments:
+        """
+        Packs Paths into fragments. A Path is closed if it ends with
+        Path.CLOSEPOLY
+        """
+        offsets = np.zeros(len(paths) + 1, dtype=np.intp)
+        np.cumsum([len(path.vertices) for path in paths], out=offsets[1:])
+        vertices = np.concatenate([path.vertices for path in paths]) if len(paths) > 0 else np.empty((0, 2), dtype=np.float64)
+        closed = np.array([path.codes is not None and path.codes[-1] == Path.CLOSEPOLY for path in paths], dtype=np.bool_)
+        return ContourFragments(vertices, offsets, closed)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get_fragment_vertices(self, i: int) -> npt.NDArray[np.float64]:
+        return self.vertices[self.offsets[i]:self.offsets[i + 1]]
+
+    def is_closed(self, i: int) -> bool:
+        return bool(self.closed[i])
+
+    def __str__(self):
+        return "ContourFragments {} fragments, {} closed".format(len(self), np.count_nonzero(self.closed))
@@ -2,22 +2,34 @@
 from __future__ import annotations
 import numpy as np
 import numpy.typing as npt
+from scipy.spatial import cKDTree
 from shapely.geometry import Polygon, Point
 from src.spacial.table_dimention import Table_Dimention
 import math
-from matplotlib.path import Path
 
 
 class ContourLoop:
-    def __init__(self, vertices, sample_vertex=None, border_indices=[]):
-        self.vertices = vertices
-        if type(self.vertices) is list:
-            self.vertices = np.array(self.vertices)
+    """
+    A closed contour loop. The first vertex is not repeated at the end. The
+    shapely Polygon and KD-tree are only built the first time they are
+    needed, since most loops are only ever asked for their area
+    """
+    __slots__ = ("vertices", "sample_vertex", "border_indices", "_area", "_polygon", "_kd_tree")
+
+    def __init__(self, vertices, sample_vertex=None, border_indices=None, area=None):
+        # Float arrays are used as they are, without a copy
+        self.vertices = np.asarray(vertices)
+        if self.vertices.dtype not in (np.float32, np.float64):
+            self.vertices = self.vertices.astype(np.float64)
         self.sample_vertex = sample_vertex
         if self.sample_vertex is None:
-            self.sample_vertex = vertices[len(vertices) // 2]
-        self.polygon = Polygon(vertices)
-        self.border_indices = border_indices
+            self.sample_vertex = self.vertices[len(self.vertices) // 2]
+        if border_indices is None:
+            border_indices = []
+        self.border_indices = np.asarray(border_indices, dtype=np.intp)
+        self._area = area
+        self._polygon = None
+        self._kd_tree = None
 
     def get_sample_vertex(self):
         return self.sample_vertex
@@ -31,12 +43,29 @@ class ContourLoop:
     def get_border_indices(self):
         return self.border_indices
     
+    def get_polygon(self) -> Polygon:
+        if self._polygon is None:
+            self._polygon = Polygon(self.vertices)
+        return self._polygon
+    
+    def get_kd_tree(self) -> cKDTree:
+        """
+        A KD-tree of the vertices, built the first time it is needed, so a
+        loop that is transitioned to several times only builds it once
+        """
+        if self._kd_tree is None:
+            self._kd_tree = cKDTree(self.vertices)
+        return self._kd_tree
+    
     def get_area(self) -> float:
-        return self.polygon.area
+        if self._area is None:
+            self._area = get_loop_area(self.vertices)
+        return self._area
     
     def contains(self, point: npt.NDArray[np.float64]):
         point = Point(*point)
-        return self.polygon.contains(point) or self.polygon.touches(point)
+        polygon = self.get_polygon()
+        return polygon.contains(point) or polygon.touches(point)
     
     def __eq__(self, other: ContourLoop):
         return np.allclose(self.vertices, other.vertices) and set(self.border_indices) == set(other.border_indices)
@@ -45,6 +74,15 @@ class ContourLoop:
         return "ContourLoop length {}".format(len(self.vertices))
 
 
+def get_loop_area(vertices: npt.NDArray) -> float:
+    """
+    The area inside a loop, with the shoelace formula
+    """
+    x = vertices[:, 0].astype(np.float64, copy=False)
+    y = vertices[:, 1].astype(np.float64, copy=False)
+    return abs(float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))) / 2
+
+
 def get_border_contour_loop(table_dim: Table_Dimention) -> ContourLoop:
     return ContourLoop(
         [
@@ -93,15 +131,15 @@ class ContourLoopBuilder:
         self.path.extend(corner_points)
 
     
-    def append_path_frag(self, path: Path):
+    def append_frag(self, vertices: npt.NDArray[np.float64]):
         
         if len(self.path) > 0:
-            self._extend_corner_links(self.path[-1], path.vertices[0])
+            self._extend_corner_links(self.path[-1], vertices[0])
             
         if self.sample_point is None:
-            self.sample_point = path.vertices[len(path.vertices) // 2]
+            self.sample_point = vertices[len(vertices) // 2]
         
-        self.path.extend(path.vertices)
+        self.path.extend(vertices)
         
         
     def get_contour_loop(self) -> ContourLoop:
@@ -111,15 +149,13 @@ class ContourLoopBuilder:
         # close loop
         self._extend_corner_links(self.path[-1], self.path[0])
         
+        vertices = np.array(self.path)
+        
         # find border points
-        border_indices = []
-        for i, location in enumerate(self.path):
-            if not self.table_dim.on_border_float(location):
-                continue
-            border_indices.append(i)
+        border_indices = np.flatnonzero(self.table_dim.on_border_array(vertices))
         
         return ContourLoop(
-            self.path,
+            vertices,
             sample_vertex=self.sample_point,
             border_indices=border_indices,
         )
\ No newline at end of file
@@ -1,84 +1,114 @@
 
 from __future__ import annotations
 from matplotlib.path import Path
-from typing import List
+import numpy as np
+import numpy.typing as npt
+from typing import List, Union
 from src.contour_calculation.contour_loop import ContourLoop, ContourLoopBuilder
+from src.contour_calculation.contour_fragments import ContourFragments
+from src.contour_calculation.loop_store import LoopStore
 from src.spacial.table_dimention import Table_Dimention
-from src.contour_calculation.linked_list import LinkedList, ListNode
 from src.logger import get_logger
 import logging
 
 logger = get_logger("loop closer", logging.DEBUG)
 
 
-class BorderPoint(ListNode):
-    def __init__(self, border_position: float, frag_stop_node: BorderPoint, loop_frag_idx: int):
-        super().__init__()
-        self.border_position = border_position
-        self.frag_stop_node = frag_stop_node
-        self.loop_frag_idx = loop_frag_idx
-    def is_start_end(self):
-        return self.frag_stop_node is not None
-    def is_stop_end(self):
-        return self.frag_stop_node is None
-    def get_stop_end(self):
-        return self.frag_stop_node
-    def smaller_than(self, other: BorderPoint):
-        return self.border_position < other.border_position
-    def __str__(self):
-        return "BP({:0.2f}, {}, {})".format(self.border_position, "ptr" if self.frag_stop_node else "None", self.loop_frag_idx)
+def _sort_border_points(border_positions: npt.NDArray[np.float64]) -> npt.NDArray[np.intp]:
+    """
+    Gets the order of the border points around the border. Points at the
+    same position are put in the reverse of the order they were given in
+    """
+    num_points = len(border_positions)
+    return (num_points - 1) - np.argsort(border_positions[::-1], kind="stable")
 
 
-def merge_loop_fragments(paths: List[Path], table_dim: Table_Dimention) -> List[ContourLoop]:
+def merge_loop_fragments(fragments: Union[ContourFragments, List[Path]], table_dim: Table_Dimention) -> List[ContourLoop]:
+    
+    if not isinstance(fragments, ContourFragments):
+        fragments = ContourFragments.from_paths(fragments)
     
     # Return this
     contour_loops: List[ContourLoop] = []
     
-    border_points = LinkedList()
-    
-    # Enumerate Frags in List
-    for i, path in enumerate(paths):
-        # No processing needed for closed loops
-        if path.codes[-1] == Path.CLOSEPOLY:
-            if len(path.vertices) < 4:
-                continue
-            contour_loops.append(ContourLoop(path.vertices[:-1]))
+    # No processing needed for closed loops
+    for i in np.flatnonzero(fragments.closed):
+        vertices = fragments.get_fragment_vertices(i)
+        if len(vertices) < 4:
             continue
-        # Loop Fragments
-        stop_node = BorderPoint(
-            table_dim.get_border_position(path.vertices[-1]), None, i
-        )
-        border_points.append_right(stop_node)
-        border_points.append_right(BorderPoint(
-            table_dim.get_border_position(path.vertices[0]), stop_node, i
-        ))
-        
-    # Sort list by border order
-    border_points.sort()
+        contour_loops.append(ContourLoop(vertices[:-1]))
+    
+    # Loop Fragments. Each has a stop point, then a start point, on the border
+    open_frag_indices = np.flatnonzero(~fragments.closed)
+    if len(open_frag_indices) == 0:
+        return contour_loops
+    border_positions = np.empty(2 * len(open_frag_indices), dtype=np.float64)
+    border_positions[0::2] = table_dim.get_border_positions(fragments.vertices[fragments.offsets[open_frag_indices + 1] - 1])
+    border_positions[1::2] = table_dim.get_border_positions(fragments.vertices[fragments.offsets[open_frag_indices]])
+    
+    # Sort points by border order. From here on, points are referred to by
+    # their place in the border order
+    point_order = _sort_border_points(border_positions)
+    point_places = np.empty_like(point_order)
+    point_places[point_order] = np.arange(len(point_order))
+    
+    # Where each point's fragment is, whether it is a stop point, and for
+    # start points, where its fragment's stop point is
+    point_frag_idx = open_frag_indices[point_order // 2].tolist()
+    point_is_stop = (point_order % 2 == 0).tolist()
+    point_stop_place = point_places[point_order - 1].tolist()
+    
+    # The points left to join, as a doubly linked list of places
+    num_points = len(point_order)
+    next_place = list(range(1, num_points)) + [None]
+    prev_place = [None] + list(range(num_points - 1))
+    head_place = 0
+    tail_place = num_points - 1
+    removed = [False] * num_points
+    
+    def remove_place(place: int):
+        nonlocal head_place, tail_place
+        if place == head_place:
+            head_place = next_place[place]
+            if head_place is not None:
+                prev_place[head_place] = None
+        elif place == tail_place:
+            tail_place = prev_place[place]
+            next_place[tail_place] = None
+        else:
+            next_place[prev_place[place]] = next_place[place]
+            prev_place[next_place[place]] = prev_place[place]
+        removed[place] = True
     
     # Join Frags
-    while border_points.get_size() > 0:
+    first_stop_place = 0
+    num_points_left = num_points
+    while num_points_left > 0:
         contour_loop_builder = ContourLoopBuilder(table_dim)
-        # Get the first stop point
-        node_itr: BorderPoint = border_points.get_head()
-        while not node_itr.is_stop_end():
-            node_itr = node_itr.get_next()
-        loop_start_node = node_itr
+        # Get the first stop point. Points are only removed, so the first
+        # stop point never moves back
+        while removed[first_stop_place] or not point_is_stop[first_stop_place]:
+            first_stop_place += 1
+        place = first_stop_place
+        loop_start_place = place
         # Connect Frags until the loop is closed
         while True:
             # Record this loop fragment
-            contour_loop_builder.append_path_frag(paths[node_itr.loop_frag_idx])
-            # Move to next start end
-            prev_node_itr = node_itr
-            node_itr = node_itr.get_next()
-            if node_itr is None:
-                node_itr = border_points.get_head()
-            border_points.remove_node(prev_node_itr)
-            # Move to corrisponding stop end
-            prev_node_itr = node_itr
-            node_itr = node_itr.get_stop_end()
-            border_points.remove_node(prev_node_itr)
-            if node_itr is loop_start_node:
+            contour_loop_builder.append_frag(fragments.get_fragment_vertices(point_frag_idx[place]))
+            # Move to next start point
+            last_place = place
+            place = next_place[place]
+            if place is None:
+                place = head_place
+            remove_place(last_place)
+            if point_is_stop[place]:
+                raise Exception("Loop fragment ends next to another fragment's end")
+            # Move to corrisponding stop point
+            last_place = place
+            place = point_stop_place[place]
+            remove_place(last_place)
+            num_points_left -= 2
+            if place == loop_start_place:
                 break
         # Concatinate linked frags
         contour_loops.append(contour_loop_builder.get_contour_loop())
@@ -86,17 +116,19 @@ def merge_loop_fragments(paths: List[Path], table_dim: Table_Dimention) -> List[
     return contour_loops
 
 
-def merge_all_loop_fragments(all_paths: List[List[Path]], table_dim: Table_Dimention) -> List[List[ContourLoop]]:
+def merge_all_loop_fragments(all_fragments: List[Union[ContourFragments, List[Path]]], table_dim: Table_Dimention) -> LoopStore:
     
     logger.debug("Closing loop fragments...")
     
-    all_contours: List[List[ContourLoop]] = []
-    for i, paths in enumerate(all_paths):
-        merged_loop_fragments = merge_loop_fragments(paths, table_dim)
+    # Each level is packed as soon as it is merged, so only one level's
+    # ContourLoop objects exist at a time
+    level_stores: List[LoopStore] = []
+    for i, fragments in enumerate(all_fragments):
+        merged_loop_fragments = merge_loop_fragments(fragments, table_dim)
         if len(merged_loop_fragments) == 0:
             continue
-        all_contours.append(merged_loop_fragments)
+        level_stores.append(LoopStore.from_loop_layers([merged_loop_fragments]))
         
     logger.info("Finished closing loop fragments")
         
-    return all_contours
\ No newline at end of file
+    return LoopStore.concatenate(level_stores)
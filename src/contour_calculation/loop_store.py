@@ -0,0 +1,235 @@
+from __future__ import annotations
+import os
+import numpy as np
+import numpy.typing as npt
+from typing import Iterator, List, Optional, Tuple
+from src.contour_calculation.contour_loop import ContourLoop
+from src.logger import get_logger
+import logging
+
+logger = get_logger("loop store", logging.DEBUG)
+
+# The arrays a LoopStore is made of. Each is saved as its own .npy file, so
+# they can be memory mapped when loaded
+LOOP_STORE_ARRAYS = (
+    "vertices",
+    "loop_offsets",
+    "level_ids",
+    "areas",
+    "clockwise",
+    "bboxes",
+    "touches_border",
+    "sample_vertices",
+    "border_indices",
+    "border_offsets",
+)
+
+
+def _get_offsets(lengths: List[int]) -> npt.NDArray[np.intp]:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _get_next_vertex_idx(loop_offsets: npt.NDArray[np.intp]) -> npt.NDArray[np.intp]:
+    """
+    The index of the vertex after each one, wrapping around to the start of
+    its loop
+    """
+    next_idx = np.arange(1, loop_offsets[-1] + 1)
+    next_idx[loop_offsets[1:] - 1] = loop_offsets[:-1]
+    return next_idx
+
+
+def get_loop_areas(vertices: npt.NDArray, loop_offsets: npt.NDArray[np.intp]) -> npt.NDArray[np.float64]:
+    """
+    The area inside each loop, with the shoelace formula, for all loops at
+    once. Loop i is vertices[loop_offsets[i]:loop_offsets[i + 1]], without
+    its first vertex repeated at the end
+    """
+    if len(loop_offsets) < 2:
+        return np.empty(0, dtype=np.float64)
+    x = vertices[:, 0].astype(np.float64, copy=False)
+    y = vertices[:, 1].astype(np.float64, copy=False)
+    next_idx = _get_next_vertex_idx(loop_offsets)
+    cross = x * y[next_idx] - x[next_idx] * y
+    return np.abs(np.add.reduceat(cross, loop_offsets[:-1])) / 2
+
+
+def get_loops_clockwise(vertices: npt.NDArray, loop_offsets: npt.NDArray[np.intp]) -> npt.NDArray[np.bool_]:
+    """
+    Whether each loop goes clockwise, for all loops at once. This is the same
+    test as is_contour_loop_convex
+    """
+    if len(loop_offsets) < 2:
+        return np.empty(0, dtype=np.bool_)
+    x = vertices[:, 0].astype(np.float64, copy=False)
+    y = vertices[:, 1].astype(np.float64, copy=False)
+    next_idx = _get_next_vertex_idx(loop_offsets)
+    return np.add.reduceat((x[next_idx] - x) * (y[next_idx] + y), loop_offsets[:-1]) > 0
+
+
+def get_loop_bboxes(vertices: npt.NDArray, loop_offsets: npt.NDArray[np.intp]) -> npt.NDArray[np.float64]:
+    """
+    The (min_x, min_y, max_x, max_y) of each loop
+    """
+    if len(loop_offsets) < 2:
+        return np.empty((0, 4), dtype=np.float64)
+    return np.concatenate((
+        np.minimum.reduceat(vertices, loop_offsets[:-1], axis=0),
+        np.maximum.reduceat(vertices, loop_offsets[:-1], axis=0),
+    ), axis=1).astype(np.float64, copy=False)
+
+
+class LoopStore:
+    """
+    The contour loops of every level, in one set of contiguous arrays. Loop i
+    is vertices[loop_offsets[i]:loop_offsets[i + 1]], and its border indices
+    are border_indices[border_offsets[i]:border_offsets[i + 1]]. Loops are
+    stored in level order, and level_ids gives the level of each one.
+
+    A LoopStore is a sequence of levels, each a list of ContourLoops, so it can
+    be used anywhere a List[List[ContourLoop]] is. The ContourLoops are views
+    onto the store's arrays, made as they are asked for.
+    """
+    def __init__(
+        self,
+        vertices: npt.NDArray,
+        loop_offsets: npt.NDArray[np.intp],
+        level_ids: npt.NDArray[np.int32],
+        areas: npt.NDArray[np.float64],
+        clockwise: npt.NDArray[np.bool_],
+        bboxes: npt.NDArray[np.float64],
+        touches_border: npt.NDArray[np.bool_],
+        sample_vertices: npt.NDArray,
+        border_indices: npt.NDArray[np.intp],
+        border_offsets: npt.NDArray[np.intp],
+    ):
+        self.vertices = vertices
+        self.loop_offsets = loop_offsets
+        self.level_ids = level_ids
+        self.areas = areas
+        self.clockwise = clockwise
+        self.bboxes = bboxes
+        self.touches_border = touches_border
+        self.sample_vertices = sample_vertices
+        self.border_indices = border_indices
+        self.border_offsets = border_offsets
+        # Where each level's loops start and stop
+        num_levels = int(level_ids[-1]) + 1 if len(level_ids) > 0 else 0
+        self.level_offsets = np.searchsorted(level_ids, np.arange(num_levels + 1))
+
+    @staticmethod
+    def from_loop_layers(loop_layers: List[List[ContourLoop]]) -> LoopStore:
+        """
+        Packs the loops of each level into a store. Empty levels are left out
+        """
+        loop_layers = [loop_layer for loop_layer in loop_layers if len(loop_layer) > 0]
+        loops = [loop for loop_layer in loop_layers for loop in loop_layer]
+
+        if len(loops) == 0:
+            return LoopStore(
+                np.empty((0, 2), dtype=np.float64), np.zeros(1, dtype=np.intp), np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.float64), np.empty(0, dtype=np.bool_), np.empty((0, 4), dtype=np.float64), np.empty(0, dtype=np.bool_),
+                np.empty((0, 2), dtype=np.float64), np.empty(0, dtype=np.intp), np.zeros(1, dtype=np.intp),
+            )
+
+        vertices = np.concatenate([loop.get_vertices() for loop in loops])
+        loop_offsets = _get_offsets([len(loop.get_vertices()) for loop in loops])
+        level_ids = np.repeat(np.arange(len(loop_layers), dtype=np.int32), [len(loop_layer) for loop_layer in loop_layers])
+        border_indices = np.concatenate([loop.get_border_indices() for loop in loops]).astype(np.intp, copy=False)
+        border_offsets = _get_offsets([len(loop.get_border_indices()) for loop in loops])
+        sample_vertices = np.array([loop.get_sample_vertex() for loop in loops], dtype=vertices.dtype)
+
+        return LoopStore(
+            vertices,
+            loop_offsets,
+            level_ids,
+            get_loop_areas(vertices, loop_offsets),
+            get_loops_clockwise(vertices, loop_offsets),
+            get_loop_bboxes(vertices, loop_offsets),
+            np.diff(border_offsets) > 0,
+            sample_vertices,
+            border_indices,
+            border_offsets,
+        )
+
+    @staticmethod
+    def concatenate(stores: List[LoopStore]) -> LoopStore:
+        """
+        Joins stores end to end. The levels of each store come after the
+        levels of the ones before it
+        """
+        stores = [store for store in stores if store.get_num_loops() > 0]
+        if len(stores) == 0:
+            return LoopStore.from_loop_layers([])
+
+        level_starts = _get_offsets([len(store) for store in stores])[:-1]
+        vertex_starts = _get_offsets([len(store.vertices) for store in stores])[:-1]
+        border_starts = _get_offsets([len(store.border_indices) for store in stores])[:-1]
+
+        return LoopStore(
+            np.concatenate([store.vertices for store in stores]),
+            np.concatenate([store.loop_offsets[:-1] + vertex_start for store, vertex_start in zip(stores, vertex_starts)] + [[vertex_starts[-1] + len(stores[-1].vertices)]]).astype(np.intp),
+            np.concatenate([store.level_ids + level_start for store, level_start in zip(stores, level_starts)]).astype(np.int32),
+            np.concatenate([store.areas for store in stores]),
+            np.concatenate([store.clockwise for store in stores]),
+            np.concatenate([store.bboxes for store in stores]),
+            np.concatenate([store.touches_border for store in stores]),
+            np.concatenate([store.sample_vertices for store in stores]),
+            np.concatenate([store.border_indices for store in stores]),
+            np.concatenate([store.border_offsets[:-1] + border_start for store, border_start in zip(stores, border_starts)] + [[border_starts[-1] + len(stores[-1].border_indices)]]).astype(np.intp),
+        )
+
+    def get_num_loops(self) -> int:
+        return len(self.level_ids)
+
+    def get_loop(self, i: int) -> ContourLoop:
+        """
+        Gets a ContourLoop that is a view onto the store. Nothing is copied
+        """
+        return ContourLoop(
+            self.vertices[self.loop_offsets[i]:self.loop_offsets[i + 1]],
+            sample_vertex=self.sample_vertices[i],
+            border_indices=self.border_indices[self.border_offsets[i]:self.border_offsets[i + 1]],
+            area=float(self.areas[i]),
+        )
+
+    def get_level_loop_range(self, level: int) -> Tuple[int, int]:
+        return int(self.level_offsets[level]), int(self.level_offsets[level + 1])
+
+    def __len__(self) -> int:
+        return len(self.level_offsets) - 1
+
+    def __getitem__(self, level: int) -> List[ContourLoop]:
+        if level < 0:
+            level += len(self)
+        if level < 0 or level >= len(self):
+            raise IndexError("Level {} is out of range for {} levels".format(level, len(self)))
+        start, stop = self.get_level_loop_range(level)
+        return [self.get_loop(i) for i in range(start, stop)]
+
+    def __iter__(self) -> Iterator[List[ContourLoop]]:
+        for level in range(len(self)):
+            yield self[level]
+
+    def save(self, store_dir: str) -> None:
+        """
+        Saves each array as a .npy file in the directory
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        for name in LOOP_STORE_ARRAYS:
+            np.save(os.path.join(store_dir, name + ".npy"), getattr(self, name))
+        logger.debug("Saved {} loops to '{}'".format(self.get_num_loops(), store_dir))
+
+    @staticmethod
+    def load(store_dir: str, mmap_mode: Optional[str] = "r") -> LoopStore:
+        """
+        Loads a store saved with save. By default the arrays are memory
+        mapped, so nothing is read until it is used
+        """
+        arrays = [np.load(os.path.join(store_dir, name + ".npy"), mmap_mode=mmap_mode) for name in LOOP_STORE_ARRAYS]
+        return LoopStore(*arrays)
+
+    def __str__(self):
+        return "LoopStore {} loops in {} levels".format(self.get_num_loops(), len(self))
@@ -0,0 +1,78 @@
+import numpy as np
+import numpy.typing as npt
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+from src.contour_calculation.contour_fragments import ContourFragments
+from src.contour_calculation.loop_closer import merge_loop_fragments
+from src.contour_calculation.loop_store import LoopStore
+from src.contour_calculation.topographic_contours import get_contour_generator, get_contour_levels, get_level_lines, get_line_spaces, split_level_lines
+from src.spacial.table_dimention import Table_Dimention
+from src.logger import get_logger
+import logging
+
+logger = get_logger("parallel contours", logging.DEBUG)
+
+# Each worker process builds its own contour generator once, so the elevation
+# data is only sent to it once
+_worker_contour_generator = None
+_worker_table_dim: Table_Dimention = None
+
+
+def _init_level_worker(elevation_data: npt.NDArray, x_line_space: npt.NDArray, y_line_space: npt.NDArray, table_dim: Table_Dimention) -> None:
+    global _worker_contour_generator, _worker_table_dim
+    _worker_contour_generator = get_contour_generator(elevation_data, x_line_space, y_line_space)
+    _worker_table_dim = table_dim
+
+
+def _get_level_contours(level: float) -> Tuple[ContourFragments, LoopStore]:
+    vertices, offsets = get_level_lines(_worker_contour_generator, level)
+    fragments = split_level_lines(vertices, offsets)
+    # Sent back as a few arrays, instead of a ContourLoop object per loop
+    return fragments, LoopStore.from_loop_layers([merge_loop_fragments(fragments, _worker_table_dim)])
+
+
+def get_contour_loops_parallel(elevation_data: npt.NDArray, table_dim: Table_Dimention, num_contours: int, workers: int) -> Tuple[List[ContourFragments], LoopStore]:
+    """
+    Traces the contours and closes their loop fragments, one level per task,
+    in a pool of worker processes. The levels are independent, and are
+    gathered back in level order, so the result is the same as get_contours
+    followed by merge_all_loop_fragments.
+
+    Parameters:
+    -----------
+    elevation_data : npt.NDArray
+        The elevations to contour
+    table_dim : Table_Dimention
+        The table the contours are scaled to
+    num_contours : int
+        The number of levels
+    workers : int
+        The number of worker processes
+
+    Returns:
+    --------
+    Tuple[List[ContourFragments], LoopStore]
+        The contour line fragments, and the closed contour loops, of each
+        level. Levels without any are left out
+    """
+    x_line_space, y_line_space = get_line_spaces(elevation_data, table_dim)
+    levels = get_contour_levels(elevation_data, num_contours)
+
+    logger.info("Contouring {} levels with {} workers...".format(len(levels), workers))
+
+    # Views such as rotated or memory mapped data are copied once here,
+    # instead of when they are sent to each worker
+    elevation_data = np.ascontiguousarray(elevation_data)
+
+    all_fragments: List[ContourFragments] = []
+    level_stores: List[LoopStore] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_level_worker, initargs=(elevation_data, x_line_space, y_line_space, table_dim)) as executor:
+        # map gives the results in level order
+        for fragments, level_store in executor.map(_get_level_contours, levels):
+            if len(fragments) > 0:
+                all_fragments.append(fragments)
+            level_stores.append(level_store)
+
+    logger.info("Finished contouring levels")
+
+    return all_fragments, LoopStore.concatenate(level_stores)
@@ -1,17 +1,16 @@
 
+import contourpy
 import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.path import Path
 import numpy as np
 import numpy.typing as npt
 import sys
-from typing import List
+from typing import List, Tuple
 matplotlib.use('Agg')  # Use the Agg backend
 from src.logger import get_logger
 import logging
 from matplotlib.figure import Figure
 from src.spacial.table_dimention import Table_Dimention
-from matplotlib.contour import QuadContourSet
+from src.contour_calculation.contour_fragments import ContourFragments
 
 logger = get_logger("topography", logging.DEBUG)
 
@@ -68,73 +67,106 @@ def compute_adaptive_levels(elevations, x_line_space, y_line_space, max_distance
     return levels
 
 
-def break_apart_sub_loops(contour_lines: QuadContourSet) -> List[List[Path]]:
+def get_contour_generator(elevation_data: npt.NDArray, x_line_space: npt.NDArray, y_line_space: npt.NDArray) -> contourpy.ContourGenerator:
+    """
+    Gets a contourpy generator, the engine behind matplotlib's contour,
+    configured the way matplotlib uses it. No figure is made
+    """
+    # The contour engine works on a float64 copy of the elevations, this is
+    # the only place they are upcast
+    return contourpy.contour_generator(
+        x_line_space, y_line_space, np.ma.masked_invalid(elevation_data, copy=False),
+        name="mpl2014", corner_mask=True, line_type=contourpy.LineType.SeparateCode, chunk_size=0)
+
+
+def get_level_lines(contour_generator: contourpy.ContourGenerator, level: float) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.intp]]:
+    """
+    Traces the contour lines at a single level
+
+    Returns:
+    --------
+    Tuple[npt.NDArray[np.float64], npt.NDArray[np.intp]]
+        The (N, 2) vertices of all of the lines, and the offsets of the start
+        of each line in the vertices. The last offset is N
+    """
+    # mpl2014 only gives the lines as separate arrays
+    lines, _ = contour_generator.lines(level)
+    offsets = np.zeros(len(lines) + 1, dtype=np.intp)
+    np.cumsum([len(line) for line in lines], out=offsets[1:])
+    vertices = np.concatenate(lines) if len(lines) > 0 else np.empty((0, 2), dtype=np.float64)
+    return vertices, offsets
+
+
+def get_contour_lines(elevation_data: npt.NDArray, x_line_space: npt.NDArray, y_line_space: npt.NDArray, levels: npt.NDArray) -> List[Tuple[npt.NDArray[np.float64], npt.NDArray[np.intp]]]:
+    """
+    Traces the contour lines at each level. See get_level_lines
+    """
+    contour_generator = get_contour_generator(elevation_data, x_line_space, y_line_space)
+    return [get_level_lines(contour_generator, level) for level in levels]
+
+
+def split_level_lines(vertices: npt.NDArray[np.float64], offsets: npt.NDArray[np.intp]) -> ContourFragments:
+    """
+    Splits the lines of a single level into fragments. The vertices are not
+    copied. The contour engine doesn't always mark closed loops, so they are
+    found from their end points
+    """
+    return ContourFragments.from_lines(vertices, offsets)
+
+
+def break_apart_sub_loops(contour_lines: List[Tuple[npt.NDArray[np.float64], npt.NDArray[np.intp]]]) -> List[ContourFragments]:
     
     all_loops = []
     
     logger.info("Breaking apart sub loops...")
     
-    # print("Found contours", len(contour_lines))
-    # print(contour_lines[0])
-    for j, collection in enumerate(contour_lines.collections):
-        
-        loops = []
-        
-        contour_paths = collection.get_paths()
-        
-        if len(contour_paths) == 0:
+    for vertices, offsets in contour_lines:
+
+        # Levels with no lines are left out
+        if len(offsets) < 2:
             continue
-        
-        path = contour_paths[0]
-        
-        vertices = path.vertices
-        codes = path.codes
-        
-        # Find positions where the path has a MOVETO command (code 1)
-        # These indicate the start of a new loop
-        moveto_indices = np.where(codes == Path.MOVETO)[0]
-        
-        # Extract each loop
-        for i in range(len(moveto_indices)):
-            start_idx = moveto_indices[i]
-            # End index is either the next MOVETO or the end of the array
-            end_idx = moveto_indices[i+1] if i+1 < len(moveto_indices) else len(vertices)
-            
-            loop_vertices = vertices[start_idx:end_idx]
-            loop_codes = codes[start_idx:end_idx]
-            
-            # pyplot contours don't always use Path.CLOSEPOLY. We expect this to be
-            # correct later, so set it now
-            if np.allclose(loop_vertices[0], loop_vertices[-1]):
-                loop_codes[-1] = Path.CLOSEPOLY
-            
-            # Create a new path for this loop
-            # loop_codes = codes[start_idx:end_idx]
-            loop_path = Path(loop_vertices, loop_codes)
-            
-            loops.append(loop_path)
-            
-        all_loops.append(loops)
+
+        all_loops.append(split_level_lines(vertices, offsets))
 
     logger.info("Finished breaking apart sub loops")
 
     return all_loops
-        
 
-def get_contours(elevation_data: npt.NDArray[np.float64], table_dim: Table_Dimention, num_contours: int) -> tuple[List[List[Path]], Figure]:
-    
+
+def get_line_spaces(elevation_data: npt.NDArray, table_dim: Table_Dimention) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
     x_line_space = np.linspace(0, table_dim.get_width_mm(), elevation_data.shape[1], dtype=np.float64)
     y_line_space = np.linspace(table_dim.get_height_mm(), 0, elevation_data.shape[0], dtype=np.float64)
+    return x_line_space, y_line_space
 
+
+def get_contour_levels(elevation_data: npt.NDArray, num_contours: int) -> npt.NDArray[np.float64]:
     # TODO this doesn't work if there is any really flat terrain
     # levels = compute_adaptive_levels(elevations, x_line_space, y_line_space)
-    levels = np.linspace(elevation_data.min(), elevation_data.max(), num_contours)
+    return np.linspace(elevation_data.min(), elevation_data.max(), num_contours)
+
+
+def get_contours(elevation_data: npt.NDArray, table_dim: Table_Dimention, num_contours: int) -> List[ContourFragments]:
+    
+    x_line_space, y_line_space = get_line_spaces(elevation_data, table_dim)
+    levels = get_contour_levels(elevation_data, num_contours)
+    
+    contour_lines = get_contour_lines(elevation_data, x_line_space, y_line_space, levels)
+    
+    return break_apart_sub_loops(contour_lines)
+
+
+def get_topography_figure(elevation_data: npt.NDArray, table_dim: Table_Dimention, num_contours: int) -> Figure:
+    """
+    Plots the same contours as get_contours. Only used for debug images, so
+    pyplot is only imported when it is needed
+    """
+    import matplotlib.pyplot as plt
+    
+    x_line_space, y_line_space = get_line_spaces(elevation_data, table_dim)
+    levels = get_contour_levels(elevation_data, num_contours)
     
-    # Plot contour lines
     fig, ax = plt.subplots()
-    contour_lines = ax.contour(x_line_space, y_line_space, elevation_data, levels=levels)
+    ax.contour(x_line_space, y_line_space, elevation_data, levels=levels)
     ax.set_aspect('equal')
     
-    contour_lines = break_apart_sub_loops(contour_lines)
-    
-    return contour_lines, fig
+    return fig
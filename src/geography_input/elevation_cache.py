@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import numpy as np
+import numpy.typing as npt
+from typing import List, Optional, Tuple
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.logger import get_logger
+import logging
+
+logger = get_logger("elevation cache", logging.DEBUG)
+
+# Least recently used entries are removed once the cache is larger than this
+DEFAULT_CACHE_SIZE_BYTES = 1024 * 1024 * 1024
+
+CACHE_KEY_VERSION = 1
+
+CACHE_FILE_EXT = ".npy"
+
+
+def get_cache_key(files_to_process: List[str], bbox: GeoBoundingBox, sample_shape: Optional[Tuple[int, int]], dtype: Optional[str] = None) -> str:
+    """
+    Gets a key that changes whenever the cropped elevation data could. That is
+    the files (in order, since the first one has priority where they overlap)
+    and their modification times, the bounding box, and the shape and dtype
+    it is sampled to
+    """
+    tiles = []
+    for file_path in (os.path.abspath(file_path) for file_path in files_to_process):
+        stat = os.stat(file_path)
+        tiles.append((file_path, stat.st_mtime_ns, stat.st_size))
+    key_contents = {
+        "version": CACHE_KEY_VERSION,
+        "tiles": tiles,
+        "bbox": [repr(value) for value in bbox.get_all_values_tuple()],
+        "sample_shape": sample_shape,
+        "dtype": dtype,
+    }
+    return hashlib.sha256(json.dumps(key_contents).encode()).hexdigest()
+
+
+class ElevationCache:
+    """
+    A directory of cropped elevation arrays, stored as .npy files named by
+    their cache key. Entries are loaded memory mapped. The modification time
+    of an entry is updated each time it is used, so the oldest entries are
+    the least recently used ones
+    """
+    def __init__(self, cache_dir: str, max_size_bytes: int = DEFAULT_CACHE_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXT)
+
+    def load(self, key: str) -> Optional[npt.NDArray]:
+        entry_path = self._get_entry_path(key)
+        if not os.path.isfile(entry_path):
+            return None
+        try:
+            elevation_data = np.load(entry_path, mmap_mode="r")
+            os.utime(entry_path)
+        except (OSError, ValueError) as err:
+            logger.warning("Could not load cached elevation data '{}': {}".format(entry_path, err))
+            return None
+        logger.debug("Loaded cached elevation data '{}'".format(entry_path))
+        return elevation_data
+
+    def store(self, key: str, elevation_data: npt.NDArray) -> None:
+        """
+        Adds the array to the cache, then evicts entries until the cache fits.
+        Failing to write to the cache is not fatal
+        """
+        if elevation_data.nbytes > self.max_size_bytes:
+            logger.debug("Elevation data is larger than the cache. Not caching it")
+            return
+        entry_path = self._get_entry_path(key)
+        # Keep the extension on the temp file, otherwise np.save adds one
+        temp_entry_path = os.path.join(self.cache_dir, key + ".tmp" + CACHE_FILE_EXT)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(temp_entry_path, elevation_data)
+            os.replace(temp_entry_path, entry_path)
+        except OSError as err:
+            logger.warning("Could not cache elevation data in '{}': {}".format(self.cache_dir, err))
+            return
+        logger.debug("Cached elevation data '{}'".format(entry_path))
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(CACHE_FILE_EXT):
+                continue
+            entry_path = os.path.join(self.cache_dir, file_name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+
+        cache_size = sum(size for _, size, _ in entries)
+
+        # Oldest first
+        entries.sort()
+        for _, size, entry_path in entries:
+            if cache_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError as err:
+                logger.warning("Could not evict cached elevation data '{}': {}".format(entry_path, err))
+                continue
+            cache_size -= size
+            logger.debug("Evicted cached elevation data '{}'".format(entry_path))
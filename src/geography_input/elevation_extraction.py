@@ -2,14 +2,20 @@ import numpy as np
 import numpy.typing as npt
 import sys
 import rasterio
-from rasterio.merge import merge
-from rasterio.mask import mask
+from rasterio.enums import Resampling
+from rasterio.errors import WindowError
+from rasterio.features import geometry_window
+from rasterio.io import MemoryFile
+from rasterio.windows import Window
 from shapely.geometry import box
 import os
 from pathlib import Path
-import tempfile
-from typing import List, Union
+from xml.sax.saxutils import escape
+from typing import List, Optional, Tuple, Union
 from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.elevation_cache import ElevationCache, get_cache_key
+from src.geography_input.hgt_reader import read_hgt_elevation_data
+from src.geography_input.tile_index import TileIndex, TILE_INDEX_FILE_NAME
 from src.logger import get_logger
 import logging
 
@@ -40,114 +46,163 @@ def _normalize_file_path(srtm_files: Union[str, List[str]]) -> List[str]:
     sys.exit(1)
 
 
-def _load_and_crop_data_from_file(srtm_file_path: str, bbox: GeoBoundingBox):
+def _get_sample_shape(window: Window, sample_shape: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    """
+    Gets the shape to read the window into. The data is only ever decimated,
+    never upsampled, so each dimention is capped at the window size
+    """
+    window_shape = (int(window.height), int(window.width))
+    if sample_shape is None:
+        return window_shape
+    return (
+        max(1, min(window_shape[0], sample_shape[0])),
+        max(1, min(window_shape[1], sample_shape[1])),
+    )
+
+
+def _load_and_crop_data_from_file(srtm_file_path: str, bbox: GeoBoundingBox, sample_shape: Optional[Tuple[int, int]] = None, dtype: Optional[str] = None):
     with rasterio.open(srtm_file_path) as src:
         
         # Verify that the file has full coverage of the bounds
         file_bounds = src.bounds
         if (bbox.get_min_lon() < file_bounds.left or bbox.get_max_lon() > file_bounds.right or
-                    bbox.get_min_lat() < file_bounds.bottom or bbox.get_max_lon() > file_bounds.top):
+                    bbox.get_min_lat() < file_bounds.bottom or bbox.get_max_lat() > file_bounds.top):
             logger.fatal("Given elevation data does not cover requested bounding box")
             sys.exit(1)
         
-        # Create a geometry from the bounds
-        geom = [box(*bbox.get_all_values_tuple())]
-        
-        # Mask the dataset to the geometry
+        # Find the outermost pixels touched by the bounds. This is the same window
+        # that mask(..., crop=True, all_touched=True) would produce
         try:
-            elevation_data, _ = mask(src, geom, crop=True, all_touched=True)
-            elevation_data = elevation_data[0]  # Get the first band
-        except ValueError:
+            window = geometry_window(src, [box(*bbox.get_all_values_tuple())])
+        except WindowError:
             logger.fatal("Merged bounds issue.")
             sys.exit(1)
+        
+        out_shape = _get_sample_shape(window, sample_shape)
+        
+        # Only the window is read. When decimating, GDAL will pick from the
+        # file's overviews if it has any. GDAL converts to the requested dtype
+        # as it reads, so there is never a copy in the file's dtype
+        elevation_data = src.read(1, window=window, out_shape=out_shape, out_dtype=dtype, resampling=Resampling.average)
 
-    logger.debug("Loaded file: {}".format(srtm_file_path))
+    logger.debug("Loaded file: {} (window {}x{}, read as {}x{})".format(
+        srtm_file_path, int(window.height), int(window.width), *out_shape
+    ))
     return elevation_data
 
 
-def _filter_relevent_files(srtm_files, bbox: GeoBoundingBox):
+def _get_tile_index_path(srtm_files: Union[str, List[str]]) -> Optional[str]:
+    """
+    The tile index is only persisted for a directory of elevation files
+    """
+    if isinstance(srtm_files, str) and os.path.isdir(srtm_files):
+        return os.path.join(srtm_files, TILE_INDEX_FILE_NAME)
+    return None
+
+
+def _filter_relevent_files(srtm_files, bbox: GeoBoundingBox, tile_index_path: Optional[str] = None):
+    
+    # Only files that are new or have changed since the last run are opened
+    tile_index = TileIndex.load(tile_index_path)
+    tile_index.update(srtm_files)
+    tile_index.save()
     
-    # First, check if any of the files intersect with our bounds
-    files_to_process = []
+    return tile_index.query(bbox)
 
-    # Check each file against the bounds
-    for file_path in srtm_files:
-        try:
-            with rasterio.open(file_path) as src:
-                file_bounds = src.bounds
-                
-                # Check if file bounds intersect with requested bounds
-                if (bbox.get_min_lon() < file_bounds.right and bbox.get_max_lon() > file_bounds.left and
-                    bbox.get_min_lat() < file_bounds.top and bbox.get_max_lat() > file_bounds.bottom):
-                    files_to_process.append(file_path)
-        except OSError as err:
-            logger.warning("Could not open '{}' Error: {}".format(file_path, err))
+
+def _build_mosaic_vrt(files_to_process) -> str:
+    """
+    Builds the XML for a virtual mosaic of all the given files. Nothing is read
+    from the files until a window of the mosaic is read, so only the pixels
+    needed for the bounding box are ever touched. The grid and metadata of the
+    first file are used for the mosaic
+    """
+    sources = []
+    for file_path in files_to_process:
+        with rasterio.open(file_path) as src:
+            sources.append((os.path.abspath(file_path), src.bounds, src.width, src.height, src.nodata))
+        
+    with rasterio.open(files_to_process[0]) as src:
+        res_x, res_y = src.res
+        crs_wkt = src.crs.to_wkt() if src.crs is not None else ""
+        data_type = _gdal_data_type_name(src.dtypes[0])
+        nodata = src.nodata
+    
+    left = min(bounds.left for _, bounds, _, _, _ in sources)
+    top = max(bounds.top for _, bounds, _, _, _ in sources)
+    right = max(bounds.right for _, bounds, _, _, _ in sources)
+    bottom = min(bounds.bottom for _, bounds, _, _, _ in sources)
+    width = int(round((right - left) / res_x))
+    height = int(round((top - bottom) / res_y))
     
-    return files_to_process
+    vrt = ['<VRTDataset rasterXSize="{}" rasterYSize="{}">'.format(width, height)]
+    vrt.append('<SRS>{}</SRS>'.format(escape(crs_wkt)))
+    vrt.append('<GeoTransform>{!r}, {!r}, 0.0, {!r}, 0.0, {!r}</GeoTransform>'.format(left, res_x, top, -res_y))
+    vrt.append('<VRTRasterBand dataType="{}" band="1">'.format(data_type))
+    if nodata is not None:
+        vrt.append('<NoDataValue>{!r}</NoDataValue>'.format(nodata))
+    # Later sources are drawn over earlier ones, so add them in reverse to
+    # give the first file priority where files overlap
+    for file_path, bounds, src_width, src_height, src_nodata in reversed(sources):
+        vrt.append('<ComplexSource>')
+        vrt.append('<SourceFilename relativeToVRT="0">{}</SourceFilename>'.format(escape(file_path)))
+        vrt.append('<SourceBand>1</SourceBand>')
+        vrt.append('<SrcRect xOff="0" yOff="0" xSize="{}" ySize="{}"/>'.format(src_width, src_height))
+        vrt.append('<DstRect xOff="{!r}" yOff="{!r}" xSize="{!r}" ySize="{!r}"/>'.format(
+            (bounds.left - left) / res_x,
+            (top - bounds.top) / res_y,
+            (bounds.right - bounds.left) / res_x,
+            (bounds.top - bounds.bottom) / res_y,
+        ))
+        if src_nodata is not None:
+            vrt.append('<NODATA>{!r}</NODATA>'.format(src_nodata))
+        vrt.append('</ComplexSource>')
+    vrt.append('</VRTRasterBand>')
+    vrt.append('</VRTDataset>')
+    return "".join(vrt)
+
+
+def _gdal_data_type_name(dtype: str) -> str:
+    return {
+        "uint8": "Byte",
+        "int8": "Int8",
+        "uint16": "UInt16",
+        "int16": "Int16",
+        "uint32": "UInt32",
+        "int32": "Int32",
+        "float32": "Float32",
+        "float64": "Float64",
+    }[dtype]
 
 
-def _load_data(files_to_process, bounds):
+def _load_data(files_to_process, bounds, sample_shape: Optional[Tuple[int, int]] = None, dtype: Optional[str] = None):
     
     if len(files_to_process) == 1:
-        return _load_and_crop_data_from_file(files_to_process[0], bounds)
+        return _load_and_crop_data_from_file(files_to_process[0], bounds, sample_shape, dtype)
     
-    # Process files sequentially using temporary files
-    # Create a temporary directory for intermediate merges
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_file = os.path.join(temp_dir, "merged.tif")
-        
-        # Start with the first file
-        current_file = files_to_process[0]
-        with rasterio.open(current_file) as src:
-            meta = src.meta.copy()
-            # Read the first band 
-            data = src.read(1)
-            
-            # Write to temporary file
-            meta.update({
-                "driver": "GTiff", 
-                "height": data.shape[0], 
-                "width": data.shape[1],
-            })
-            with rasterio.open(temp_file, 'w', **meta) as dst:
-                dst.write(data, 1)
-        
-        # Process remaining files
-        for i in range(1, len(files_to_process)):
-            try:
-                # Open current merged file and next file to merge
-                with rasterio.open(temp_file) as src1, rasterio.open(files_to_process[i]) as src2:
-                    # Merge the datasets
-                    mosaic, out_transform = merge([src1, src2])
-                    
-                    # Update metadata
-                    meta = src1.meta.copy()
-                    meta.update({
-                        "driver": "GTiff",
-                        "height": mosaic.shape[1],
-                        "width": mosaic.shape[2],
-                        "transform": out_transform,
-                    })
-                    
-                    # Write to a new temporary file
-                    new_temp = os.path.join(temp_dir, f"merged_{i}.tif")
-                    with rasterio.open(new_temp, 'w', **meta) as dst:
-                        dst.write(mosaic)
-                    
-                    # Replace the old temp file
-                    os.replace(new_temp, temp_file)
-            except Exception as e:
-                logger.warning("Error processing file {}: {}".format(files_to_process, e))
-        
-        # Read the final merged result
-        return _load_and_crop_data_from_file(temp_file, bounds)
+    # Mosaic all the files virtually, then only read the bounds window from it.
+    # The VRT lives in GDAL's in-memory filesystem, so nothing touches the disk
+    mosaic_vrt = _build_mosaic_vrt(files_to_process)
+    
+    with MemoryFile(mosaic_vrt.encode(), ext=".vrt") as mosaic_file:
+        return _load_and_crop_data_from_file(mosaic_file.name, bounds, sample_shape, dtype)
 
 
+def _can_read_natively(files_to_process: List[str], sample_shape: Optional[Tuple[int, int]]) -> bool:
+    """
+    The native reader only reads .hgt files at full resolution. Decimated reads
+    are left to GDAL's resampling
+    """
+    if sample_shape is not None:
+        return False
+    return all(os.path.splitext(file_path)[1].lower() == ".hgt" for file_path in files_to_process)
 
-def get_srtm_elevation_data(srtm_files, bbox: GeoBoundingBox) -> npt.NDArray[np.float64]:
+
+def get_srtm_elevation_data(srtm_files, bbox: GeoBoundingBox, sample_shape: Optional[Tuple[int, int]] = None, native_hgt: bool = False, cache_dir: Optional[str] = None, dtype: Optional[str] = None) -> npt.NDArray:
     """
     Extract elevation data from multiple SRTM data files using rasterio.
-    Files are processed sequentially to minimize memory usage.
+    Multiple files are mosaiced virtually, so only the pixels inside the
+    bounding box are ever read.
     
     Parameters:
     -----------
@@ -157,16 +212,31 @@ def get_srtm_elevation_data(srtm_files, bbox: GeoBoundingBox) -> npt.NDArray[np.
         or a single file path.
     bbox : GeoBoundingBox
         Bounding box to get data for
+    sample_shape : tuple (rows, cols), optional
+        The largest shape to read the bounding box into. If the source data
+        has a higher resolution, it is decimated (averaged) while reading.
+        Defaults to the full resolution of the source data
+    native_hgt : bool
+        Read .hgt files with the memory mapped reader instead of rasterio.
+        Only used when all the relevant files are .hgt files, and they are
+        read at full resolution
+    cache_dir : str, optional
+        A directory to cache the cropped elevation data in. Later calls for the
+        same files, bounds and sample shape load the cached data memory mapped
+        instead of reading the files
+    dtype : str, optional
+        The dtype to keep the elevations in, such as "int16" or "float32".
+        Defaults to the dtype of the source data, which is int16 for SRTM data
     
     Returns:
     --------
-    npt.NDArray[np.float64]
+    npt.NDArray
     """
     norm_srtm_files = _normalize_file_path(srtm_files)
     
     logger.info("Found {} elevation files from path '{}'".format(len(norm_srtm_files), srtm_files))
 
-    files_to_process = _filter_relevent_files(norm_srtm_files, bbox)
+    files_to_process = _filter_relevent_files(norm_srtm_files, bbox, _get_tile_index_path(srtm_files))
     
     if len(files_to_process) == 0:
         logger.fatal("None of the provided files intersect with the specified bounds.")
@@ -174,7 +244,29 @@ def get_srtm_elevation_data(srtm_files, bbox: GeoBoundingBox) -> npt.NDArray[np.
 
     logger.info("Found {} relevant elevation files".format(len(files_to_process)))
     
-    elevation_data = _load_data(files_to_process, bbox)
+    elevation_cache = None
+    if cache_dir is not None:
+        elevation_cache = ElevationCache(cache_dir)
+        cache_key = get_cache_key(files_to_process, bbox, sample_shape, dtype)
+        elevation_data = elevation_cache.load(cache_key)
+        if elevation_data is not None:
+            logger.info("Loaded elevation data from the cache")
+            return elevation_data
+    
+    elevation_data = None
+    if native_hgt and _can_read_natively(files_to_process, sample_shape):
+        try:
+            elevation_data = read_hgt_elevation_data(files_to_process, bbox)
+            if dtype is not None:
+                elevation_data = elevation_data.astype(dtype, copy=False)
+        except ValueError as err:
+            logger.warning("Could not read .hgt files natively. Using rasterio: {}".format(err))
+    
+    if elevation_data is None:
+        elevation_data = _load_data(files_to_process, bbox, sample_shape, dtype)
+    
+    if elevation_cache is not None:
+        elevation_cache.store(cache_key, elevation_data)
 
     logger.info("Successfully loaded all necessary elevation data")
     
@@ -0,0 +1,162 @@
+import math
+import os
+import re
+import sys
+import numpy as np
+import numpy.typing as npt
+from affine import Affine
+from typing import List, Tuple
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.logger import get_logger
+import logging
+
+logger = get_logger("hgt reader", logging.DEBUG)
+
+# SRTM .hgt files are square grids of big-endian signed 16 bit integers
+HGT_DTYPE = np.dtype(">i2")
+
+# The value used for voids in the data, and for areas not covered by any file
+HGT_NODATA = -32768
+
+_HGT_FILE_NAME_PATTERN = re.compile(r"([NS])(\d{2})([EW])(\d{3})", re.IGNORECASE)
+
+
+class HgtTile:
+    """
+    A single .hgt file, memory mapped. The file name gives the latitude and
+    longitude of the south west corner. The samples sit on the grid lines, so
+    the edge rows and columns are shared with the neighboring tiles
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.sw_lat, self.sw_lon = _parse_hgt_file_name(file_path)
+        self.samples = _get_hgt_samples(file_path)
+        self.data = np.memmap(file_path, dtype=HGT_DTYPE, mode="r", shape=(self.samples, self.samples))
+
+
+def _parse_hgt_file_name(file_path: str) -> Tuple[int, int]:
+    match = _HGT_FILE_NAME_PATTERN.search(os.path.basename(file_path))
+    if match is None:
+        raise ValueError("Can not get the location of '{}' from its name".format(file_path))
+    lat_hemisphere, lat, lon_hemisphere, lon = match.groups()
+    lat = int(lat) * (1 if lat_hemisphere.upper() == "N" else -1)
+    lon = int(lon) * (1 if lon_hemisphere.upper() == "E" else -1)
+    return lat, lon
+
+
+def _get_hgt_samples(file_path: str) -> int:
+    num_values = os.path.getsize(file_path) // HGT_DTYPE.itemsize
+    samples = math.isqrt(num_values)
+    if samples * samples != num_values or samples < 2:
+        raise ValueError("'{}' is not a square .hgt grid".format(file_path))
+    return samples
+
+
+def _get_bbox_window(transform: Affine, bbox: GeoBoundingBox, height: int, width: int) -> Tuple[int, int, int, int]:
+    """
+    Gets the (row_start, row_stop, col_start, col_stop) of the outermost pixels
+    touched by the bounds. This matches the window rasterio's geometry_window
+    gives for the same grid
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox.get_all_values_tuple()
+    inverse_transform = ~transform
+    cols, rows = zip(*[
+        inverse_transform * (lon, lat) for lon, lat in ((min_lon, min_lat), (min_lon, max_lat), (max_lon, max_lat), (max_lon, min_lat))
+    ])
+    row_start = max(0, int(math.floor(min(rows))))
+    row_stop = min(height, int(math.ceil(max(rows))))
+    col_start = max(0, int(math.floor(min(cols))))
+    col_stop = min(width, int(math.ceil(max(cols))))
+    return row_start, row_stop, col_start, col_stop
+
+
+def read_hgt_elevation_data(hgt_files: List[str], bbox: GeoBoundingBox) -> npt.NDArray[np.int16]:
+    """
+    Reads the bounding box out of SRTM .hgt files without going through GDAL.
+    The files are memory mapped, and mosaiced by where they sit in a shared
+    grid, so only the pixels inside the bounding box are read. The result is
+    the same as get_srtm_elevation_data for the same files. When the bounding
+    box is inside a single file, the returned array is a view of the mapped
+    file, and is not copied.
+
+    Parameters:
+    -----------
+    hgt_files : list
+        List of paths to .hgt files. Where files overlap, the first one is used
+    bbox : GeoBoundingBox
+        Bounding box to get data for
+
+    Returns:
+    --------
+    npt.NDArray[np.int16]
+    """
+    tiles = [HgtTile(file_path) for file_path in hgt_files]
+
+    samples = tiles[0].samples
+    if any(tile.samples != samples for tile in tiles):
+        raise ValueError("All .hgt files must have the same resolution")
+    tile_span = samples - 1
+
+    # The mosaic grid, in whole degrees
+    west = min(tile.sw_lon for tile in tiles)
+    east = max(tile.sw_lon for tile in tiles) + 1
+    south = min(tile.sw_lat for tile in tiles)
+    north = max(tile.sw_lat for tile in tiles) + 1
+    height = (north - south) * tile_span + 1
+    width = (east - west) * tile_span + 1
+
+    # Pixels are centered on the grid lines
+    res = 1.0 / tile_span
+    transform = Affine(res, 0.0, west - 0.5 / tile_span, 0.0, -res, north + 0.5 / tile_span)
+
+    # Verify that the files have full coverage of the bounds
+    left, top = transform * (0, 0)
+    right, bottom = transform * (width, height)
+    if (bbox.get_min_lon() < left or bbox.get_max_lon() > right or
+            bbox.get_min_lat() < bottom or bbox.get_max_lat() > top):
+        logger.fatal("Given elevation data does not cover requested bounding box")
+        sys.exit(1)
+
+    row_start, row_stop, col_start, col_stop = _get_bbox_window(transform, bbox, height, width)
+
+    elevation_data = None
+    # Later tiles are drawn over earlier ones, so draw them in reverse to give
+    # the first file priority where tiles overlap
+    for tile in reversed(tiles):
+        tile_row = (north - (tile.sw_lat + 1)) * tile_span
+        tile_col = (tile.sw_lon - west) * tile_span
+
+        # The part of the window inside this tile, in mosaic coordinates
+        overlap_row_start = max(row_start, tile_row)
+        overlap_row_stop = min(row_stop, tile_row + samples)
+        overlap_col_start = max(col_start, tile_col)
+        overlap_col_stop = min(col_stop, tile_col + samples)
+        if overlap_row_start >= overlap_row_stop or overlap_col_start >= overlap_col_stop:
+            continue
+
+        tile_window = tile.data[
+            overlap_row_start - tile_row:overlap_row_stop - tile_row,
+            overlap_col_start - tile_col:overlap_col_stop - tile_col,
+        ]
+        logger.debug("Read .hgt file: {}".format(tile.file_path))
+
+        # No need to copy if this one tile covers the whole window
+        if (overlap_row_start, overlap_row_stop, overlap_col_start, overlap_col_stop) == (row_start, row_stop, col_start, col_stop):
+            elevation_data = tile_window
+            continue
+
+        if elevation_data is None or isinstance(elevation_data, np.memmap):
+            window_data = np.full((row_stop - row_start, col_stop - col_start), HGT_NODATA, dtype=np.int16)
+            if elevation_data is not None:
+                window_data[:] = elevation_data
+            elevation_data = window_data
+
+        elevation_data[
+            overlap_row_start - row_start:overlap_row_stop - row_start,
+            overlap_col_start - col_start:overlap_col_stop - col_start,
+        ] = tile_window
+
+    if elevation_data is None:
+        elevation_data = np.full((row_stop - row_start, col_stop - col_start), HGT_NODATA, dtype=np.int16)
+
+    return elevation_data
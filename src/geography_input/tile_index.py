@@ -0,0 +1,139 @@
+from __future__ import annotations
+import json
+import os
+import rasterio
+from shapely import STRtree
+from shapely.geometry import box
+from typing import Dict, List, Optional
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.logger import get_logger
+import logging
+
+logger = get_logger("tile index", logging.DEBUG)
+
+# The index is kept next to the tiles it describes
+TILE_INDEX_FILE_NAME = ".tile_index.json"
+
+TILE_INDEX_VERSION = 1
+
+
+class TileIndex:
+    """
+    Records the bounds, CRS and resolution of each elevation file, so files do
+    not need to be opened with rasterio to find which ones cover a bounding box.
+    Entries are keyed by absolute file path and are only refreshed when the
+    file's modification time or size changes.
+    """
+    def __init__(self, index_file_path: Optional[str] = None):
+        self.index_file_path = index_file_path
+        self.tiles: Dict[str, dict] = {}
+        self.file_paths: List[str] = []
+        self.modified = False
+        self._tree: STRtree = None
+        self._tree_file_paths: List[str] = []
+
+    @staticmethod
+    def load(index_file_path: Optional[str]) -> TileIndex:
+        """
+        Loads the index from disk. A missing or unreadable index file gives an
+        empty index, which will be rebuilt by update(). If no path is given,
+        the index is only kept in memory
+        """
+        tile_index = TileIndex(index_file_path)
+        if index_file_path is None or not os.path.isfile(index_file_path):
+            return tile_index
+        try:
+            with open(index_file_path, "r") as file:
+                contents = json.load(file)
+        except (OSError, ValueError) as err:
+            logger.warning("Could not read tile index '{}'. Rebuilding it: {}".format(index_file_path, err))
+            return tile_index
+        if contents.get("version") != TILE_INDEX_VERSION:
+            logger.info("Tile index '{}' is out of date. Rebuilding it".format(index_file_path))
+            return tile_index
+        tile_index.tiles = contents["tiles"]
+        return tile_index
+
+    def update(self, file_paths: List[str]) -> None:
+        """
+        Makes the index describe exactly the given files. Only new or changed
+        files are opened. Files no longer in the list are dropped
+        """
+        self.file_paths = [os.path.abspath(file_path) for file_path in file_paths]
+        self._tree = None
+
+        reindexed_count = 0
+        tiles = {}
+        for file_path in self.file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError as err:
+                logger.warning("Could not open '{}' Error: {}".format(file_path, err))
+                continue
+            tile = self.tiles.get(file_path)
+            if tile is None or tile["mtime_ns"] != stat.st_mtime_ns or tile["size"] != stat.st_size:
+                tile = self._read_tile(file_path, stat)
+                reindexed_count += 1
+            if tile is not None:
+                tiles[file_path] = tile
+
+        if reindexed_count > 0 or tiles.keys() != self.tiles.keys():
+            self.modified = True
+        self.tiles = tiles
+
+        logger.debug("Indexed {} new or changed files out of {}".format(reindexed_count, len(self.file_paths)))
+
+    @staticmethod
+    def _read_tile(file_path: str, stat: os.stat_result) -> Optional[dict]:
+        try:
+            with rasterio.open(file_path) as src:
+                return {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "bounds": list(src.bounds),
+                    "crs": src.crs.to_string() if src.crs is not None else None,
+                    "res": list(src.res),
+                }
+        except OSError as err:
+            logger.warning("Could not open '{}' Error: {}".format(file_path, err))
+            return None
+
+    def query(self, bbox: GeoBoundingBox) -> List[str]:
+        """
+        Gets the files that intersect the bounding box, in the order they were
+        given to update()
+        """
+        if self._tree is None:
+            self._tree_file_paths = [file_path for file_path in self.file_paths if file_path in self.tiles]
+            self._tree = STRtree([box(*self.tiles[file_path]["bounds"]) for file_path in self._tree_file_paths])
+
+        min_lon, min_lat, max_lon, max_lat = bbox.get_all_values_tuple()
+
+        # The tree gives every file whose bounds overlap the bbox envelope,
+        # including ones that only touch it, so check for a true overlap
+        files_to_process = []
+        for tree_idx in sorted(self._tree.query(box(min_lon, min_lat, max_lon, max_lat))):
+            file_path = self._tree_file_paths[tree_idx]
+            left, bottom, right, top = self.tiles[file_path]["bounds"]
+            if min_lon < right and max_lon > left and min_lat < top and max_lat > bottom:
+                files_to_process.append(file_path)
+
+        return files_to_process
+
+    def save(self) -> None:
+        """
+        Writes the index to disk if it has changed. Failing to write the index
+        is not fatal, it will just be rebuilt next time
+        """
+        if self.index_file_path is None or not self.modified:
+            return
+        temp_file_path = self.index_file_path + ".tmp"
+        try:
+            with open(temp_file_path, "w") as file:
+                json.dump({"version": TILE_INDEX_VERSION, "tiles": self.tiles}, file)
+            os.replace(temp_file_path, self.index_file_path)
+        except OSError as err:
+            logger.warning("Could not write tile index '{}': {}".format(self.index_file_path, err))
+            return
+        self.modified = False
+        logger.debug("Saved tile index '{}'".format(self.index_file_path))
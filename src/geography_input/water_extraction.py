@@ -1,20 +1,32 @@
 
 import geopandas as gpd
 import osmnx as ox
+import threading
 from osmnx._errors import InsufficientResponseError
 from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.water_store import read_water_store
 from src.logger import get_logger
 import logging
 
 logger = get_logger("water import", logging.DEBUG)
 
-def get_lakes_with_area(bbox: GeoBoundingBox):
+# How long to wait for the lake lookup once everything else is ready
+LAKE_LOOKUP_TIMEOUT_S = 60
+
+
+def get_empty_lakes_gdf() -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
+
+
+def get_lakes_with_area(bbox: GeoBoundingBox, water_store_path: str = None):
     """
     Get only lakes (not rivers or other waterways) within a bounding box,
     and calculate their areas.
     
     Parameters:
     - bbox: GeoBoundingBox
+    - water_store_path: A local water store to read from, instead of querying
+      OpenStreetMap. See build_water_store
     
     Returns:
     - lakes_gdf: GeoDataFrame containing lakes with area information
@@ -26,8 +38,12 @@ def get_lakes_with_area(bbox: GeoBoundingBox):
     tags = {'natural': ['water']}
     
     try:
-        # Get water features from OpenStreetMap
-        water_gdf = ox.features_from_bbox(bbox.get_all_values_tuple(), tags)
+        if water_store_path is not None:
+            # Get water features from the local store
+            water_gdf = read_water_store(water_store_path, bbox)
+        else:
+            # Get water features from OpenStreetMap
+            water_gdf = ox.features_from_bbox(bbox.get_all_values_tuple(), tags)
         
         # Filter to keep only lakes and similar water bodies (exclude rivers)
         # Common OSM tags for lakes
@@ -50,27 +66,60 @@ def get_lakes_with_area(bbox: GeoBoundingBox):
         # Clip to ensure only lakes completely within the bounding box
         lakes_gdf = gpd.clip(lakes_gdf, bbox_gdf)
         
-        # Calculate area in square kilometers
-        lakes_gdf = lakes_gdf.to_crs('+proj=utm +zone=11 +datum=WGS84')  # Convert to UTM for area calculation
-        lakes_gdf['area_km2'] = lakes_gdf.geometry.area / 1000000  # Convert m² to km²
-        lakes_gdf = lakes_gdf.to_crs("EPSG:4326")  # Convert back to WGS84
+        # Calculate area in square kilometers. Only the geometry is projected,
+        # into an equal-area projection local to the bbox
+        lakes_gdf['area_km2'] = lakes_gdf.geometry.to_crs(bbox.get_local_equal_area_crs()).area / 1000000  # Convert m² to km²
         
         # Sort by area (largest first)
         lakes_gdf = lakes_gdf.sort_values('area_km2', ascending=False)
         
     except InsufficientResponseError as err:
-        lakes_gdf = gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
+        lakes_gdf = get_empty_lakes_gdf()
     
     
     # Print lake information
     if not lakes_gdf.empty:
-        logger.info("Found {} lakes within the bounding box".format(len(lakes_gdf)))
-        for _, row in lakes_gdf.iterrows():
-            name = row.get('name', 'Unnamed lake')
-            logger.debug("  - {}: {:.2f} km²".format(name, row['area_km2']))
+        logger.info("Found {} lakes within the bounding box, {:.2f} km² in total".format(len(lakes_gdf), lakes_gdf['area_km2'].sum()))
+        largest_lake = lakes_gdf.iloc[0]
+        name = largest_lake.get('name')
+        if not isinstance(name, str):
+            name = 'Unnamed lake'
+        logger.debug("  Largest lake - {}: {:.2f} km²".format(name, largest_lake['area_km2']))
         logger.warning("Lakes are not used yet in the gcode")
     else:
         logger.info("No lakes found within the specified bounding box.")
         
     return lakes_gdf
-    
+
+
+class LakeLookup:
+    """
+    Runs get_lakes_with_area in the background, so it can wait on the network
+    while other work is done. The thread is a daemon, so a lookup that never
+    returns can not keep the program from exiting
+    """
+    def __init__(self, bbox: GeoBoundingBox, water_store_path: str = None):
+        self.lakes_gdf: gpd.GeoDataFrame = None
+        self.error: Exception = None
+        self.thread = threading.Thread(target=self._lookup, args=(bbox, water_store_path), daemon=True)
+        self.thread.start()
+
+    def _lookup(self, bbox: GeoBoundingBox, water_store_path: str):
+        try:
+            self.lakes_gdf = get_lakes_with_area(bbox, water_store_path)
+        except Exception as err:
+            self.error = err
+
+    def get_lakes(self, timeout_s: float = LAKE_LOOKUP_TIMEOUT_S) -> gpd.GeoDataFrame:
+        """
+        Waits for the lookup to finish. If it fails, or does not finish in
+        time, no lakes are returned
+        """
+        self.thread.join(timeout_s)
+        if self.thread.is_alive():
+            logger.warning("Lake lookup did not finish within {} seconds. Continuing without lakes".format(timeout_s))
+            return get_empty_lakes_gdf()
+        if self.error is not None:
+            logger.warning("Lake lookup failed. Continuing without lakes: {}".format(self.error))
+            return get_empty_lakes_gdf()
+        return self.lakes_gdf
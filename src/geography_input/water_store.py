@@ -0,0 +1,108 @@
+import argparse
+import os
+import re
+import sys
+import geopandas as gpd
+from argparse import ArgumentParser
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.logger import get_logger
+import logging
+
+logger = get_logger("water store", logging.DEBUG)
+
+WATER_STORE_LAYER = "water"
+
+# The columns kept in the store. These are the OSM tags used to pick out lakes
+WATER_STORE_COLUMNS = ["natural", "water", "waterway", "name"]
+
+# GDAL's OSM driver puts area features in this layer, and any tag without its
+# own column into the other_tags column, as "key"=>"value" pairs
+OSM_AREA_LAYER = "multipolygons"
+
+_OSM_OTHER_TAGS_PATTERN = '"{}"=>"((?:[^"\\\\]|\\\\.)*)"'
+
+
+def _get_osm_other_tag(other_tags: str, tag: str):
+    if not isinstance(other_tags, str):
+        return None
+    match = re.search(_OSM_OTHER_TAGS_PATTERN.format(re.escape(tag)), other_tags)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def _read_water_features(source_path: str) -> gpd.GeoDataFrame:
+    """
+    Reads the natural=water features from an OSM extract (.osm.pbf or .osm),
+    or from any vector file that has the OSM tags as columns
+    """
+    is_osm_extract = source_path.endswith(".osm.pbf") or source_path.endswith(".osm")
+    layer = OSM_AREA_LAYER if is_osm_extract else None
+
+    water_gdf = gpd.read_file(source_path, layer=layer, where="natural = 'water'")
+
+    # Tags without their own column are in other_tags
+    if "other_tags" in water_gdf.columns:
+        for tag in WATER_STORE_COLUMNS:
+            if tag not in water_gdf.columns:
+                water_gdf[tag] = water_gdf["other_tags"].map(lambda other_tags: _get_osm_other_tag(other_tags, tag))
+
+    for tag in WATER_STORE_COLUMNS:
+        if tag not in water_gdf.columns:
+            water_gdf[tag] = None
+
+    return water_gdf[WATER_STORE_COLUMNS + ["geometry"]].to_crs("EPSG:4326")
+
+
+def build_water_store(source_path: str, store_path: str) -> None:
+    """
+    Builds a GeoPackage of the water features in an OSM extract, so lakes can be
+    looked up without network access. GDAL gives the GeoPackage a spatial index,
+    so reading a bounding box out of it only touches the features near it.
+
+    Parameters:
+    -----------
+    source_path : str
+        An OSM extract (.osm.pbf or .osm), or any vector file with the OSM
+        natural, water, waterway and name tags as columns
+    store_path : str
+        The GeoPackage to write. It is replaced if it already exists
+    """
+    logger.info("Reading water features from '{}'...".format(source_path))
+    water_gdf = _read_water_features(source_path)
+
+    logger.info("Writing {} water features to '{}'...".format(len(water_gdf), store_path))
+    if os.path.exists(store_path):
+        os.remove(store_path)
+    water_gdf.to_file(store_path, layer=WATER_STORE_LAYER, driver="GPKG", SPATIAL_INDEX="YES")
+
+    logger.info("Finished building water store")
+
+
+def read_water_store(store_path: str, bbox: GeoBoundingBox) -> gpd.GeoDataFrame:
+    """
+    Gets the water features from the store that intersect the bounding box
+    """
+    water_gdf = gpd.read_file(store_path, layer=WATER_STORE_LAYER, bbox=bbox.get_all_values_tuple())
+    logger.debug("Read {} water features from '{}'".format(len(water_gdf), store_path))
+    return water_gdf
+
+
+class Arguments(argparse.Namespace):
+    source: str
+    store: str
+
+
+def main(argsv):
+    parser = ArgumentParser(prog='water_store', description='Build a local store of water features from an OSM extract')
+    parser.add_argument('source', type=str, help='OSM extract (.osm.pbf or .osm) to read water features from')
+    parser.add_argument('store', type=str, help='GeoPackage file to write the water store to')
+    args: Arguments = parser.parse_args(argsv)
+
+    build_water_store(args.source, args.store)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,27 +1,44 @@
 
 from src.geography_input.elevation_extraction import get_srtm_elevation_data
-from src.geography_input.water_extraction import get_lakes_with_area
+from src.geography_input.water_extraction import LakeLookup
 from src.visualization.plot_geography import visualize_topography_with_lakes
 from src.spacial.geo_coord_sys import GeoBoundingBox, crop_bounding_box_to_ratio
-from src.contour_calculation.topographic_contours import get_contours
+from src.contour_calculation.topographic_contours import get_contours, get_topography_figure
 from src.contour_calculation.loop_closer import merge_all_loop_fragments
-from src.visualization.visualize_contour import dump_contour_image, dump_multiple_contour_images
+from src.contour_calculation.parallel_contours import get_contour_loops_parallel
+from src.visualization.visualize_contour import dump_contour_image, dump_multiple_contour_images, dump_path_image
 from src.spacial.table_dimention import Table_Dimention
 from src.topography_tree.build_topography_tree import build_topography_tree
-from src.topography_tree.tree_elaboration import generate_tree_spiral_path
+from src.topography_tree.topography_tree_node import TopographyTreeNode
+from src.topography_tree.tree_elaboration import PATH_CHUNK_SIZE, generate_tree_spiral_path, iter_tree_spiral_path
 import logging
+import math
 import sys
+import tempfile
 from src.logger import get_logger
 import os
 from src.path_post_processing.path_utils import get_total_length
 import numpy.typing as npt
+from typing import Iterator
 import numpy as np
-from src.path_post_processing.path_mask import crop_path_to_circle
+from src.path_post_processing.path_mask import CircleMask, crop_path_to_circle
 
 logger = get_logger("main", logging.DEBUG)
 
 
-def get_elevation_data(bbox: GeoBoundingBox, table_dim: Table_Dimention, input_data_paths: str, rotation_deg: int, debug_file_dir: str = None) -> npt.NDArray[np.float64]:
+def _get_sample_shape(table_dim: Table_Dimention, rotation_deg: int, samples_per_mm: float) -> tuple[int, int]:
+    """
+    Gets the (rows, cols) shape of the elevation data, before rotation, that
+    gives the requested number of samples per millimeter on the table
+    """
+    rows = math.ceil(table_dim.get_height_mm() * samples_per_mm)
+    cols = math.ceil(table_dim.get_width_mm() * samples_per_mm)
+    if rotation_deg in {90, 270}:
+        return (cols, rows)
+    return (rows, cols)
+
+
+def get_elevation_data(bbox: GeoBoundingBox, table_dim: Table_Dimention, input_data_paths: str, rotation_deg: int, debug_file_dir: str = None, samples_per_mm: float = None, native_hgt: bool = False, cache_dir: str = None, elevation_dtype: str = None, water_store_path: str = None) -> npt.NDArray:
     
     geo_sample_aspect_ratio = table_dim.get_aspect_ratio()
     if rotation_deg in {90, 270}:
@@ -30,25 +47,35 @@ def get_elevation_data(bbox: GeoBoundingBox, table_dim: Table_Dimention, input_d
     # Crop the GeoBBox into the same aspect ratio as the table
     bbox = crop_bounding_box_to_ratio(bbox, geo_sample_aspect_ratio)
     
-    # Get elevation data
-    elevation_data = get_srtm_elevation_data(input_data_paths, bbox)
+    # Only read as much resolution as the table can show
+    sample_shape = None
+    if samples_per_mm is not None:
+        sample_shape = _get_sample_shape(table_dim, rotation_deg, samples_per_mm)
+    
+    # Lakes are only drawn in the debug plot, so they are only looked up for
+    # it. The lookup waits on the network while the elevation data is read
+    lake_lookup = None
+    if debug_file_dir is not None:
+        lake_lookup = LakeLookup(bbox, water_store_path)
+    
+    # Get elevation data. It is kept in the compact dtype it was read in
+    elevation_data = get_srtm_elevation_data(input_data_paths, bbox, sample_shape=sample_shape, native_hgt=native_hgt, cache_dir=cache_dir, dtype=elevation_dtype)
 
     # Debug
     logger.debug("Elevation Shape {}".format(elevation_data.shape))
     
-    # Get lakes with area information
-    lakes_gdf = get_lakes_with_area(bbox)
-    
     # Visualize the topography with lakes
-    if debug_file_dir is not None:
+    if lake_lookup is not None:
+        lakes_gdf = lake_lookup.get_lakes()
         visualize_topography_with_lakes(bbox, elevation_data, lakes_gdf, debug_file_dir)
         
+    # This is a view. It is only made contiguous when it is contoured
     elevation_data = np.rot90(elevation_data, k=(rotation_deg // 90))
     
     return elevation_data
 
 
-def convert_elevation_data_to_path(elevation_data: npt.NDArray[np.float64], table_dim: Table_Dimention, num_contours: int = 20, debug_file_dir: str = None) -> npt.NDArray[np.float64]:
+def _get_topography_tree(elevation_data: npt.NDArray, table_dim: Table_Dimention, num_contours: int, debug_file_dir: str, workers: int) -> TopographyTreeNode:
 
     if debug_file_dir is not None and not os.path.isdir(debug_file_dir):
         logger.debug("Creating directory for images: {}".format(debug_file_dir))
@@ -58,21 +85,24 @@ def convert_elevation_data_to_path(elevation_data: npt.NDArray[np.float64], tabl
             logger.error("Could not create debug dir '{}'. Skipping debug files: {}".format(err))
             debug_file_dir = None
 
-    contour_line_paths, contour_fig = get_contours(elevation_data, table_dim, num_contours)
+    if workers > 1:
+        contour_fragments, contour_loops = get_contour_loops_parallel(elevation_data, table_dim, num_contours, workers)
+    else:
+        contour_fragments = get_contours(elevation_data, table_dim, num_contours)
+        contour_loops = merge_all_loop_fragments(contour_fragments, table_dim)
     
     # Visual debug
-    # List List Path
+    # List ContourFragments
     if debug_file_dir is not None:
         try:
+            contour_fig = get_topography_figure(elevation_data, table_dim, num_contours)
             contour_fig.savefig(os.path.join(debug_file_dir, "topography"), dpi=300)
         except OSError as err:
             logger.error("Failed to save contour plot: {}".format(err))
-        dump_multiple_contour_images(debug_file_dir, "contour", contour_line_paths, table_dim)
-    
-    contour_loops = merge_all_loop_fragments(contour_line_paths, table_dim)
+        dump_multiple_contour_images(debug_file_dir, "contour", contour_fragments, table_dim)
     
     # Visual debug
-    # List List ContourLoop
+    # LoopStore
     if debug_file_dir is not None:
         dump_multiple_contour_images(debug_file_dir, "defragged_contour", contour_loops, table_dim)
         
@@ -81,26 +111,87 @@ def convert_elevation_data_to_path(elevation_data: npt.NDArray[np.float64], tabl
     
     # Debug
     # topo_tree.pretty_print_tree()
+    
+    return topo_tree
+
+
+def convert_elevation_data_to_path(elevation_data: npt.NDArray, table_dim: Table_Dimention, num_contours: int = 20, debug_file_dir: str = None, workers: int = 1) -> npt.NDArray[np.float64]:
+    
+    topo_tree = _get_topography_tree(elevation_data, table_dim, num_contours, debug_file_dir, workers)
         
-    path = generate_tree_spiral_path(topo_tree)
+    path = generate_tree_spiral_path(topo_tree, workers=workers)
     
     if table_dim.is_circular():
         path = crop_path_to_circle(path, table_dim)
     
     return path
+
+
+def iter_elevation_data_to_path(elevation_data: npt.NDArray, table_dim: Table_Dimention, num_contours: int = 20, debug_file_dir: str = None, workers: int = 1, chunk_size: int = PATH_CHUNK_SIZE) -> Iterator[npt.NDArray]:
+    """
+    Yields the same path as convert_elevation_data_to_path, in chunks of
+    about chunk_size positions. The chunks are cropped to a circular table
+    one at a time, so the whole path is never held at once
+    """
+    
+    topo_tree = _get_topography_tree(elevation_data, table_dim, num_contours, debug_file_dir, workers)
+    
+    circle_mask = CircleMask(table_dim) if table_dim.is_circular() else None
+    if circle_mask is not None:
+        logger.debug("Cropping path to circle as it is generated...")
+    
+    for path_chunk in iter_tree_spiral_path(topo_tree, workers=workers, chunk_size=chunk_size):
+        if circle_mask is not None:
+            path_chunk = circle_mask.crop(path_chunk)
+        if len(path_chunk) > 0:
+            yield path_chunk
+
+
+def _iter_path_file_chunks(path_file, num_vertices: int, chunk_size: int) -> Iterator[npt.NDArray[np.float64]]:
+    """
+    Reads back a path written to a file as float64 (x, y) pairs, a chunk at
+    a time
+    """
+    path_file.seek(0)
+    for chunk_start in range(0, num_vertices, chunk_size):
+        num_chunk_vertices = min(chunk_size, num_vertices - chunk_start)
+        yield np.frombuffer(path_file.read(num_chunk_vertices * 2 * 8), dtype=np.float64).reshape(num_chunk_vertices, 2)
+
+
+def _write_gcode_header(file, bbox: GeoBoundingBox, table_dim: Table_Dimention, rotation_deg: int, total_dist_meters: float) -> None:
+    file.write(";\n")
+    file.write("; Topographic Map\n")
+    if table_dim.is_circular():
+        file.write("; Table Diameter (millimeters): {}\n".format(table_dim.get_width_mm()))
+    else:
+        file.write("; Rectangular Table Shape (millimeters): {} x {}\n".format(table_dim.get_width_mm(), table_dim.get_height_mm()))
+    file.write("; Latitude:  [{:.06f}, {:.06f}]\n".format(bbox.get_min_lat(), bbox.get_max_lat()))
+    file.write("; Longitude: [{:.06f}, {:.06f}]\n".format(bbox.get_min_lon(), bbox.get_max_lon()))
+    file.write("; Total Path Distance (meters): {:.3f}\n".format(total_dist_meters))
+    file.write("; North is to the {}\n".format({0:"top", 90:"left", 180:"bottom", 270:"right"}[rotation_deg]))
+    file.write(";\n\n")
+
+
+def _write_gcode_moves(file, path: npt.NDArray[np.float64]) -> None:
+    for location in path:
+        file.write("G01 X{:.3f} Y{:.3f}\n".format(*location))
+
+
+def convert_geography_to_gcode(bbox: GeoBoundingBox, table_dim: Table_Dimention, rotation_deg: int, input_data_paths: str, output_gcode_filepath: str, num_contours: int = 20, debug_file_dir: str = None, samples_per_mm: float = None, native_hgt: bool = False, cache_dir: str = None, elevation_dtype: str = None, water_store_path: str = None, workers: int = 1, stream: bool = False):
     
-    
-def convert_geography_to_gcode(bbox: GeoBoundingBox, table_dim: Table_Dimention, rotation_deg: int, input_data_paths: str, output_gcode_filepath: str, num_contours: int = 20, debug_file_dir: str = None):
-    
-    elevation_data = get_elevation_data(bbox, table_dim, input_data_paths, rotation_deg, debug_file_dir=debug_file_dir)
-    
-    path = convert_elevation_data_to_path(elevation_data, table_dim, num_contours=num_contours, debug_file_dir=debug_file_dir)
+    elevation_data = get_elevation_data(bbox, table_dim, input_data_paths, rotation_deg, debug_file_dir=debug_file_dir, samples_per_mm=samples_per_mm, native_hgt=native_hgt, cache_dir=cache_dir, elevation_dtype=elevation_dtype, water_store_path=water_store_path)
     
     # Get the basename of the output file path
     output_file_basepath, output_file_ext = os.path.splitext(output_gcode_filepath)
     if output_file_ext != ".gcode":
         output_file_basepath += output_file_ext
     
+    if stream:
+        _stream_path_to_gcode(elevation_data, bbox, table_dim, rotation_deg, output_file_basepath, num_contours=num_contours, debug_file_dir=debug_file_dir, workers=workers)
+        return
+    
+    path = convert_elevation_data_to_path(elevation_data, table_dim, num_contours=num_contours, debug_file_dir=debug_file_dir, workers=workers)
+    
     # Numpy (Nx2)
     dump_contour_image(output_file_basepath + ".png", path, table_dim)
     
@@ -111,19 +202,48 @@ def convert_geography_to_gcode(bbox: GeoBoundingBox, table_dim: Table_Dimention,
     output_gcode_filepath = output_file_basepath + ".gcode"
     try:
         with open(output_gcode_filepath, "w") as file:
-            file.write(";\n")
-            file.write("; Topographic Map\n")
-            if table_dim.is_circular():
-                file.write("; Table Diameter (millimeters): {}\n".format(table_dim.get_width_mm()))
-            else:
-                file.write("; Rectangular Table Shape (millimeters): {} x {}\n".format(table_dim.get_width_mm(), table_dim.get_height_mm()))
-            file.write("; Latitude:  [{:.06f}, {:.06f}]\n".format(bbox.get_min_lat(), bbox.get_max_lat()))
-            file.write("; Longitude: [{:.06f}, {:.06f}]\n".format(bbox.get_min_lon(), bbox.get_max_lon()))
-            file.write("; Total Path Distance (meters): {:.3f}\n".format(total_dist_meters))
-            file.write("; North is to the {}\n".format({0:"top", 90:"left", 180:"bottom", 270:"right"}[rotation_deg]))
-            file.write(";\n\n")
-            for location in path:
-                file.write("G01 X{:.3f} Y{:.3f}\n".format(*location))
+            _write_gcode_header(file, bbox, table_dim, rotation_deg, total_dist_meters)
+            _write_gcode_moves(file, path)
+    except OSError as err:
+        logger.fatal("Could not output gcode file '{}': {}".format(output_gcode_filepath, err))
+        sys.exit(1)
+
+    logger.info("Successfully wrote gcode to '{}'".format(output_gcode_filepath))
+
+
+def _stream_path_to_gcode(elevation_data: npt.NDArray, bbox: GeoBoundingBox, table_dim: Table_Dimention, rotation_deg: int, output_file_basepath: str, num_contours: int = 20, debug_file_dir: str = None, workers: int = 1, chunk_size: int = PATH_CHUNK_SIZE):
+    """
+    Writes the same image and gcode as convert_geography_to_gcode, while only
+    holding a chunk of the path at a time.
+    
+    The gcode header needs the length of the whole path, and the image is
+    colored by how far along the path it is. So the path is first generated
+    into a temporary file, a chunk at a time, and then read back in chunks
+    """
+    output_gcode_filepath = output_file_basepath + ".gcode"
+    
+    try:
+        with tempfile.TemporaryFile() as path_file:
+            
+            num_vertices = 0
+            total_dist_mm = 0
+            last_point = None
+            for path_chunk in iter_elevation_data_to_path(elevation_data, table_dim, num_contours=num_contours, debug_file_dir=debug_file_dir, workers=workers, chunk_size=chunk_size):
+                total_dist_mm = get_total_length(path_chunk, start_dist_mm=total_dist_mm, previous_point=last_point)
+                last_point = path_chunk[-1].copy()
+                path_file.write(np.ascontiguousarray(path_chunk, dtype=np.float64).tobytes())
+                num_vertices += len(path_chunk)
+            
+            dump_path_image(output_file_basepath + ".png", _iter_path_file_chunks(path_file, num_vertices, chunk_size), num_vertices, table_dim)
+            
+            total_dist_meters = total_dist_mm / 1000
+            logger.info("Total Distance {:.3f} (m)".format(total_dist_meters))
+            
+            # Write output gcode file
+            with open(output_gcode_filepath, "w") as file:
+                _write_gcode_header(file, bbox, table_dim, rotation_deg, total_dist_meters)
+                for path_chunk in _iter_path_file_chunks(path_file, num_vertices, chunk_size):
+                    _write_gcode_moves(file, path_chunk)
     except OSError as err:
         logger.fatal("Could not output gcode file '{}': {}".format(output_gcode_filepath, err))
         sys.exit(1)
@@ -143,44 +143,82 @@ def _point_in_circle(circle_center, circle_radius, point) -> bool:
     return euclidean(circle_center, point) <= circle_radius
 
 
-def crop_path_to_circle(path: npt.NDArray[np.float64], table_dim: Table_Dimention) -> npt.NDArray[np.float64]:
-    
-    logger.debug("Cropping path to circle...")
-    
-    circle_radius = table_dim.get_width_mm() / 2
-    circle_center = np.array([circle_radius, circle_radius], dtype=float)
-    
-    currently_in_circle: bool = _point_in_circle(circle_center, circle_radius, path[0])
-    last_intersection = None
-    
-    masked_path = []
-    
-    for i in range(1, len(path)):
-        
-        in_circle: bool = _point_in_circle(circle_center, circle_radius, path[i])
-        
-        if not currently_in_circle and not in_circle:
-            continue
-        
-        if currently_in_circle and in_circle:
-            masked_path.append(path[i])
-            continue
+class CircleMask:
+    """
+    Crops a path to the circle of a circular table, one chunk at a time. The
+    path can be split into chunks anywhere, the cropped chunks join up into
+    the same path crop_path_to_circle gives for all of it
+    """
+    def __init__(self, table_dim: Table_Dimention):
+        self.circle_radius = table_dim.get_width_mm() / 2
+        self.circle_center = np.array([self.circle_radius, self.circle_radius], dtype=float)
         
-        intersections = circle_line_intersection(circle_center, circle_radius, path[i-1], path[i])
+        # Where the path left off at the end of the last chunk
+        self.last_point = None
+        self.currently_in_circle: bool = None
+        self.last_intersection = None
+    
+    def get_cropped_points(self, path_chunk: npt.NDArray[np.float64]) -> List:
+        """
+        Gets the points of the chunk that are in the circle, with arcs around
+        the edge of the circle where the path goes outside of it
+        """
+        masked_path = []
         
-        if len(intersections) != 1:
-            logger.warning("Detected mask cross, but did not calculate one intersection. Got {}".format(intersections))
-            continue
+        for point in path_chunk:
             
-        intersection = intersections[0]
-        
-        # transitioning into the circle
-        if in_circle and last_intersection is not None:
-            masked_path.extend(circular_arc_path(circle_center, circle_radius, last_intersection, intersection))
+            # The first point of the path only says where it starts
+            if self.last_point is None:
+                self.currently_in_circle = _point_in_circle(self.circle_center, self.circle_radius, point)
+                self.last_point = point
+                continue
+            
+            last_point = self.last_point
+            self.last_point = point
+            
+            in_circle: bool = _point_in_circle(self.circle_center, self.circle_radius, point)
+            
+            if not self.currently_in_circle and not in_circle:
+                continue
+            
+            if self.currently_in_circle and in_circle:
+                masked_path.append(point)
+                continue
+            
+            intersections = circle_line_intersection(self.circle_center, self.circle_radius, last_point, point)
+            
+            if len(intersections) != 1:
+                logger.warning("Detected mask cross, but did not calculate one intersection. Got {}".format(intersections))
+                continue
+                
+            intersection = intersections[0]
+            
+            # transitioning into the circle
+            if in_circle and self.last_intersection is not None:
+                masked_path.extend(circular_arc_path(self.circle_center, self.circle_radius, self.last_intersection, intersection))
+            
+            self.last_intersection = intersection
+            self.currently_in_circle = in_circle
         
-        last_intersection = intersection
-        currently_in_circle = in_circle
+        return masked_path
+    
+    def crop(self, path_chunk: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """
+        Crops the next chunk of the path. Returns an (n, 2) array, which may
+        be empty
+        """
+        masked_path = self.get_cropped_points(path_chunk)
+        if len(masked_path) == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        return np.array(masked_path)
+
+
+def crop_path_to_circle(path: npt.NDArray[np.float64], table_dim: Table_Dimention) -> npt.NDArray[np.float64]:
+    
+    logger.debug("Cropping path to circle...")
+    
+    masked_path = CircleMask(table_dim).get_cropped_points(path)
         
     logger.info("Path cropped to circle")
         
-    return np.array(masked_path)
\ No newline at end of file
+    return np.array(masked_path)
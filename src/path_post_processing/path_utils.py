@@ -1,13 +1,15 @@
-
 import numpy as np
 import numpy.typing as npt
 from scipy.spatial.distance import euclidean
 
-def get_total_length(path: npt.NDArray[np.float64]) -> float:
+def get_total_length(path: npt.NDArray[np.float64], start_dist_mm: float = 0, previous_point: npt.NDArray[np.float64] = None) -> float:
     """
-    Returns the total path length
+    Returns the total path length. A path given a chunk at a time is measured
+    by passing in the length so far, and the last point of the chunk before
     """
-    total_dist_mm = 0
+    total_dist_mm = start_dist_mm
+    if previous_point is not None and len(path) > 0:
+        total_dist_mm += euclidean(previous_point, path[0])
     for i in range(len(path) - 1):
         total_dist_mm += euclidean(path[i], path[i+1])
     return total_dist_mm
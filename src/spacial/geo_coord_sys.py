@@ -46,6 +46,15 @@ class GeoBoundingBox:
             (min_lon, max_lat),
             (min_lon, min_lat)
         ])
+    def get_local_equal_area_crs(self) -> str:
+        """
+        A Lambert azimuthal equal-area projection centered on the bounding box.
+        Areas measured in it are accurate for anything near the bounding box,
+        wherever it is on the globe
+        """
+        return "+proj=laea +lat_0={} +lon_0={} +datum=WGS84 +units=m +no_defs".format(
+            self.get_lat_midpoint(), self.get_lon_midpoint()
+        )
 
 
 def crop_bounding_box_to_ratio(bbox: GeoBoundingBox, aspect_ratio: float) -> GeoBoundingBox:
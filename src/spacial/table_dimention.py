@@ -1,5 +1,18 @@
 
 import math
+import numpy as np
+import numpy.typing as npt
+
+# The relative tolerance math.isclose uses by default
+BORDER_REL_TOL = 1e-9
+
+
+def _isclose_array(values: npt.NDArray[np.float64], target: float) -> npt.NDArray[np.bool_]:
+    """
+    math.isclose, with its default tolerances, for every value at once
+    """
+    return np.abs(values - target) <= BORDER_REL_TOL * np.maximum(np.abs(values), abs(target))
+
 
 class Table_Dimention:
     
@@ -46,6 +59,41 @@ class Table_Dimention:
         pos += (self.get_width_mm() - x0)
         return pos
     
+    def _get_border_sides(self, locations: npt.NDArray[np.float64]) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.bool_], npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+        locations = np.asarray(locations, dtype=np.float64)
+        x, y = locations[:, 0], locations[:, 1]
+        on_left   = _isclose_array(x, 0)
+        on_top    = _isclose_array(y, self.get_height_mm())
+        on_right  = _isclose_array(x, self.get_width_mm())
+        on_bottom = _isclose_array(y, 0)
+        return on_left, on_top, on_right, on_bottom
+
+    def on_border_array(self, locations: npt.NDArray[np.float64]) -> npt.NDArray[np.bool_]:
+        """
+        on_border_float for each location in an (N, 2) array
+        """
+        on_left, on_top, on_right, on_bottom = self._get_border_sides(locations)
+        return on_left | on_top | on_right | on_bottom
+
+    def get_border_positions(self, locations: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """
+        get_border_position for each location in an (N, 2) array
+        """
+        locations = np.asarray(locations, dtype=np.float64)
+        x, y = locations[:, 0], locations[:, 1]
+        on_left, on_top, on_right, on_bottom = self._get_border_sides(locations)
+        width = self.get_width_mm()
+        height = self.get_height_mm()
+        # The first side a location is on wins, in the same order as get_border_position
+        positions = np.select(
+            [on_left, on_top, on_right, on_bottom],
+            [y, height + x, height + width + (height - y), height + width + height + (width - x)],
+            default=np.nan,
+        )
+        if np.isnan(positions).any():
+            raise Exception("Point {} is not on border".format(locations[np.argmax(np.isnan(positions))]))
+        return positions
+
     def get_aspect_ratio(self) -> float:
         return self.width_mm / self.height_mm
     
@@ -1,8 +1,12 @@
 
 from src.topography_tree.topography_tree_node import TopographyTreeNode
-from typing import List
+from typing import List, Union
 from src.contour_calculation.contour_loop import ContourLoop, get_border_contour_loop
-from shapely.geometry import Polygon
+from src.contour_calculation.loop_store import LoopStore
+import numpy as np
+import numpy.typing as npt
+import shapely
+from shapely import STRtree
 from src.spacial.table_dimention import Table_Dimention
 from src.logger import get_logger
 import logging
@@ -17,76 +21,104 @@ CRITICAL_LOOP_AREA = 20
 def is_contour_loop_convex(loop: ContourLoop) -> bool:
     
     vertices = loop.get_vertices()
+    x = vertices[:, 0].astype(np.float64, copy=False)
+    y = vertices[:, 1].astype(np.float64, copy=False)
     
-    # Calculate the signed area using the shoelace formula
-    signed_area = 0
-    
-    # The loop needs to consider consecutive pairs of points
-    # and wrap around to the first point
-    for i in range(len(vertices)):
-        x1, y1 = vertices[i]
-        x2, y2 = vertices[(i + 1) % len(vertices)]
-        
-        # Add the cross product
-        signed_area += (x2 - x1) * (y2 + y1)
+    # Calculate the signed area using the shoelace formula. The loop needs to
+    # consider consecutive pairs of points and wrap around to the first point
+    signed_area = np.sum((np.roll(x, -1) - x) * (np.roll(y, -1) + y))
     
     # If the signed area is negative, the polygon is clockwise
-    return signed_area > 0
+    return bool(signed_area > 0)
+
 
+def find_parent_loops(loops: List[ContourLoop]) -> npt.NDArray[np.intp]:
+    """
+    Finds the smallest loop that each loop is nested in. Contour loops never
+    cross, so a loop is inside another if its sample vertex is, and the other
+    is larger. The sample vertices are put in an STRtree, and all of the loop
+    polygons are queried at once
 
-def build_topography_tree(loop_layers: List[List[ContourLoop]], table_dim: Table_Dimention) -> TopographyTreeNode:
+    Returns:
+    --------
+    npt.NDArray[np.intp]
+        The index in loops of each loop's parent, or -1 if it is not nested
+        in any of them
+    """
+    parent_loop_idx = np.full(len(loops), -1, dtype=np.intp)
+    if len(loops) == 0:
+        return parent_loop_idx
     
-    topo_tree = TopographyTreeNode(get_border_contour_loop(table_dim))
+    areas = np.array([loop.get_area() for loop in loops], dtype=np.float64)
+    sample_vertices = np.array([loop.get_sample_vertex() for loop in loops], dtype=np.float64).reshape(-1, 2)
+    
+    # The polygons are queried against a tree of the points, rather than the
+    # other way around, so each polygon is prepared once and tested against
+    # all of the points near it. A point intersects a polygon when the
+    # polygon contains or touches it
+    vertex_tree = STRtree(shapely.points(sample_vertices))
+    loop_idx, vertex_idx = vertex_tree.query([loop.get_polygon() for loop in loops], predicate="intersects")
     
-    leaf_nodes = [topo_tree]
+    # A loop's own polygon, and any loops it touches, are not larger than it
+    is_larger = areas[loop_idx] > areas[vertex_idx]
+    vertex_idx = vertex_idx[is_larger]
+    loop_idx = loop_idx[is_larger]
+    
+    # The smallest loop around each one is its parent
+    order = np.lexsort((areas[loop_idx], vertex_idx))
+    vertex_idx = vertex_idx[order]
+    loop_idx = loop_idx[order]
+    is_first = np.ones(len(vertex_idx), dtype=np.bool_)
+    is_first[1:] = vertex_idx[1:] != vertex_idx[:-1]
+    parent_loop_idx[vertex_idx[is_first]] = loop_idx[is_first]
+    
+    return parent_loop_idx
+
+
+def build_topography_tree(loop_layers: Union[LoopStore, List[List[ContourLoop]]], table_dim: Table_Dimention) -> TopographyTreeNode:
+    
+    topo_tree = TopographyTreeNode(get_border_contour_loop(table_dim))
     
     too_small_loop_count = 0
+    basin_loop_count = 0
     
-    for loop_layer in loop_layers:
+    # Find the loops to add onto the tree
+    loops: List[ContourLoop] = []
+    for level, loop_layer in enumerate(loop_layers):
         
-        if len(leaf_nodes) == 0:
-            logger.error("No current leaf nodes. Skipping further tree generation")
-            break
+        # A store already has the direction of every loop
+        if isinstance(loop_layers, LoopStore):
+            start, stop = loop_layers.get_level_loop_range(level)
+            layer_convex = loop_layers.clockwise[start:stop]
+        else:
+            layer_convex = [is_contour_loop_convex(loop) for loop in loop_layer]
         
-        new_leaf_nodes = []
-        
-        # Add each loop onto a tree
-        for loop in loop_layer:
+        for loop, is_convex in zip(loop_layer, layer_convex):
             
             if loop.get_area() < CRITICAL_LOOP_AREA:
                 too_small_loop_count += 1
                 continue
             
-            if not is_contour_loop_convex(loop):
-                logger.warning("Concave loop of area {:.2f} cm-sq encountered. Concave topo features are not supported yet. Skipping".format(
-                    loop.get_area() / SQ_MM_TO_SQ_CM
-                ))
-                continue
-            
-            # Check all leaf nodes to see which one to add this loop to
-            for leaf in leaf_nodes:
-                
-                if not leaf.loop.contains(loop.get_sample_vertex()):
-                    continue
-                
-                node = TopographyTreeNode(loop)
-                leaf.add_child(node)
-                new_leaf_nodes.append(node)
-                break
-            
-            else:
-                logger.warning(
-                    "Could not fit loop of area {:.2f} cm-sq into any {} leaves of the tree".format(
-                        loop.get_area() / SQ_MM_TO_SQ_CM, len(leaf_nodes)
-                    )
-                )
+            # Loops around low ground go the other way
+            if not is_convex:
+                basin_loop_count += 1
             
-        if len(new_leaf_nodes) > 0:
-            leaf_nodes = new_leaf_nodes
+            loops.append(loop)
+    
+    # Nest each loop in the smallest loop around it. Loops are added in level
+    # order, so each node's children are too
+    parent_loop_idx = find_parent_loops(loops)
+    nodes = [TopographyTreeNode(loop) for loop in loops]
+    for node, parent_idx in zip(nodes, parent_loop_idx):
+        parent_node = topo_tree if parent_idx < 0 else nodes[parent_idx]
+        parent_node.add_child(node)
     
     if too_small_loop_count > 0:
         logger.debug("Skipped {} loops because they were too small".format(too_small_loop_count))
     
+    if basin_loop_count > 0:
+        logger.debug("Added {} loops around basins".format(basin_loop_count))
+    
     logger.info("Finished building topo tree")
     
     return topo_tree
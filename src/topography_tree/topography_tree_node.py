@@ -1,12 +1,17 @@
 
 from __future__ import annotations
-from typing import List
+from typing import Iterator, List, Optional
 from src.contour_calculation.contour_loop import ContourLoop
 
 class TopographyTreeNode:
     def __init__(self, loop: ContourLoop):
         self.loop = loop
         self.children: List[TopographyTreeNode] = []
+        self.parent: Optional[TopographyTreeNode] = None
+        # The depth and size of the subtree from this node. Worked out when
+        # they are first needed, and cleared when a node is added below
+        self._max_depth: Optional[int] = None
+        self._size: Optional[int] = None
     
     
     def get_loop(self) -> ContourLoop:
@@ -15,47 +20,91 @@ class TopographyTreeNode:
     
     def add_child(self, child: TopographyTreeNode):
         self.children.append(child)
+        child.parent = self
+        # If a node's stats are cleared, so are all of its ancestors'
+        node = self
+        while node is not None and node._max_depth is not None:
+            node._max_depth = None
+            node._size = None
+            node = node.parent
+    
+    
+    def _update_subtree_stats(self):
+        """
+        Works out the depth and size of every subtree below this node that
+        does not have them yet, from the bottom up
+        """
+        stack = [(self, False)]
+        while len(stack) > 0:
+            node, children_done = stack.pop()
+            if node._max_depth is not None:
+                continue
+            if children_done:
+                node._max_depth = max((child._max_depth for child in node.children), default=0) + 1
+                node._size = sum(child._size for child in node.children) + 1
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children)
         
         
-    def get_size(self):
-        size = 1
-        for child in self.children:
-            size += child.get_size()
-        return size
+    def get_size(self) -> int:
+        self._update_subtree_stats()
+        return self._size
     
     
     def get_max_depth(self) -> int:
-        max_depth = 0
-        for child in self.children:
-            max_depth = max(max_depth, child.get_max_depth())
-        return max_depth + 1
+        self._update_subtree_stats()
+        return self._max_depth
+    
+    
+    def _get_child_order(self) -> List[int]:
+        """
+        The indices of the children, deepest branch first. Between branches
+        of the same depth, the last child comes first
+        """
+        child_idx_order = [(child.get_max_depth(), i) for i, child in enumerate(self.children)]
+        child_idx_order.sort(reverse=True)
+        return [child_idx for _, child_idx in child_idx_order]
     
         
-    def unravel_tree(self) -> List[tuple[ContourLoop, bool]]:
+    def iter_unravel_tree(self) -> Iterator[tuple[ContourLoop, bool]]:
         """
-        Unravels the tree, in a modified post-and-in-order-traversal, adding the node data (loop)
-        to the list. The boolean indicates if it was added as part of post-order traversal.
+        Unravels the tree, in a modified post-and-in-order-traversal, yielding the node data (loop)
+        as it goes. The boolean indicates if it was yielded as part of post-order traversal.
         (i.e. it is the last time the traversal hits it). The children of each node
-        are sorted by the deepest branch from them
+        are sorted by the deepest branch from them. The traversal uses a stack, not
+        recursion, so deep trees are fine
         """
-        child_idx_order = [(child.get_max_depth(), i) for i, child in enumerate(self.children)]
-        child_idx_order.sort()
-        child_idx_order = child_idx_order[::-1]
+        self._update_subtree_stats()
+        
+        # Each entry is a node, the order of its children, and how many of
+        # them have been traversed
+        stack = [(self, self._get_child_order(), 0)]
+        while len(stack) > 0:
+            node, child_idx_order, num_children_done = stack.pop()
+            if num_children_done == len(child_idx_order):
+                yield (node.loop, True)
+                continue
+            if num_children_done > 0:
+                yield (node.loop, False)
+            stack.append((node, child_idx_order, num_children_done + 1))
+            child = node.children[child_idx_order[num_children_done]]
+            stack.append((child, child._get_child_order(), 0))
+    
         
-        tree_path = []
-        for i, (_, child_idx) in enumerate(child_idx_order):
-            tree_path.extend(self.children[child_idx].unravel_tree())
-            if i < (len(child_idx_order) - 1):
-                tree_path.append((self.loop, False))
-        tree_path.append((self.loop, True))
-        return tree_path
+    def unravel_tree(self) -> List[tuple[ContourLoop, bool]]:
+        """
+        iter_unravel_tree, as a list
+        """
+        return list(self.iter_unravel_tree())
             
         
     def pretty_print_tree(self, level=0):
-        """Recursively prints the tree structure."""
-        # Print the current node's level
-        print('  ' * level + '|--' + str(self.loop))  # |-- is a visual marker for the branching
-
-        # Recurse over each child and print with incremented indentation
-        for child in self.children:
-            child.pretty_print_tree(level + 1)
+        """Prints the tree structure."""
+        stack = [(self, level)]
+        while len(stack) > 0:
+            node, node_level = stack.pop()
+            # Print the current node's level
+            print('  ' * node_level + '|--' + str(node.loop))  # |-- is a visual marker for the branching
+            # Children are popped in order, with incremented indentation
+            stack.extend((child, node_level + 1) for child in reversed(node.children))
@@ -1,19 +1,21 @@
 import numpy as np
-from scipy.spatial.distance import euclidean
 import math
+from concurrent.futures import ThreadPoolExecutor
 from src.topography_tree.topography_tree_node import TopographyTreeNode
 from src.spacial.table_dimention import Table_Dimention
 from src.contour_calculation.contour_loop import ContourLoop
-from typing import List
+from typing import Iterator, List
 import numpy as np
 import numpy.typing as npt
-from scipy.spatial.distance import euclidean
 import math
 from src.logger import get_logger
 import logging
 
 logger = get_logger("elaborator", logging.DEBUG)
 
+# The default number of positions in each chunk of iter_tree_spiral_path
+PATH_CHUNK_SIZE = 65536
+
 
 def find_best_transition(from_loop, to_loop, sample_size=50) -> tuple[int, int]:
     """
@@ -28,56 +30,44 @@ def find_best_transition(from_loop, to_loop, sample_size=50) -> tuple[int, int]:
         Tuple of (from_idx, to_idx) representing the best transition points
     """
     # Convert loops to numpy arrays
-    from_loop_np = np.array(from_loop)
-    to_loop_np = np.array(to_loop)
+    from_loop_np = np.asarray(from_loop, dtype=np.float64)
+    to_loop_np = np.asarray(to_loop, dtype=np.float64)
+    
+    # The directions along to_loop are the same for every from point
+    to_directions = get_loop_directions(to_loop_np)
     
     # Sample points from from_loop
-    if sample_size >= len(from_loop):
-        sample_indices = np.arange(len(from_loop))
+    if sample_size >= len(from_loop_np):
+        sample_indices = np.arange(len(from_loop_np))
     else:
-        sample_indices = np.linspace(0, len(from_loop) - 1, sample_size, dtype=int)
-    
-    # Helper function to evaluate a from_idx against the to_loop
-    def evaluate_from_point(from_idx):
-        # Find best to_idx and score for this from_idx
-        best_to_idx, best_score = find_best_to_point(from_loop_np, to_loop_np, from_idx)
-        return from_idx, best_to_idx, best_score
-    
-    # Find the best from_idx in our sample
-    best_from_idx = 0
-    best_to_idx = 0
-    best_score = float('-inf')
-    
-    for from_idx in sample_indices:
-        from_idx, to_idx, score = evaluate_from_point(int(from_idx))
-        if score > best_score:
-            best_score = score
-            best_from_idx = from_idx
-            best_to_idx = to_idx
+        sample_indices = np.linspace(0, len(from_loop_np) - 1, sample_size, dtype=int)
+    
+    # Find the best from_idx in our sample, scoring all of them at once
+    sample_to_indices, sample_scores = find_best_to_points(from_loop_np, to_loop_np, sample_indices, to_directions)
+    best_sample = int(np.argmax(sample_scores))
     
     # Perform local refinement using gradient descent
     max_iterations = 10
-    current_from_idx = best_from_idx
-    current_to_idx = best_to_idx
-    current_score = best_score
+    current_from_idx = int(sample_indices[best_sample])
+    current_to_idx = int(sample_to_indices[best_sample])
+    current_score = sample_scores[best_sample]
     
     for _ in range(max_iterations):
         # Try neighbors
-        left_idx = (current_from_idx - 1) % len(from_loop)
-        right_idx = (current_from_idx + 1) % len(from_loop)
+        left_idx = (current_from_idx - 1) % len(from_loop_np)
+        right_idx = (current_from_idx + 1) % len(from_loop_np)
         
         # Evaluate neighbors
-        left_from_idx, left_to_idx, left_score = evaluate_from_point(left_idx)
-        right_from_idx, right_to_idx, right_score = evaluate_from_point(right_idx)
+        (left_to_idx, right_to_idx), (left_score, right_score) = find_best_to_points(from_loop_np, to_loop_np, np.array([left_idx, right_idx]), to_directions)
         
         # Find the best neighbor
         if left_score > current_score and left_score >= right_score:
             current_from_idx = left_idx
-            current_to_idx = left_to_idx
+            current_to_idx = int(left_to_idx)
             current_score = left_score
         elif right_score > current_score:
             current_from_idx = right_idx
-            current_to_idx = right_to_idx
+            current_to_idx = int(right_to_idx)
             current_score = right_score
         else:
             # No improvement, we've reached a local maximum
@@ -86,88 +76,85 @@ def find_best_transition(from_loop, to_loop, sample_size=50) -> tuple[int, int]:
     return (current_from_idx, current_to_idx)
 
 
-def find_best_to_point(from_loop_np, to_loop_np, from_idx: int) -> tuple[int, float]:
+def get_loop_directions(loop_np: npt.NDArray[np.float64]) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.bool_]]:
+    """
+    Gets the unit vector from each point of a loop to the next one, and
+    whether it is defined. It is not where the points are too close together
+    """
+    directions = np.roll(loop_np, -1, axis=0) - loop_np
+    lengths = np.sqrt(directions[:, 0] * directions[:, 0] + directions[:, 1] * directions[:, 1])
+    is_defined = lengths > 1e-6
+    unit_directions = np.zeros_like(directions)
+    np.divide(directions, lengths[:, np.newaxis], out=unit_directions, where=is_defined[:, np.newaxis])
+    return unit_directions, is_defined
+
+
+def find_best_to_points(from_loop_np, to_loop_np, from_indices: npt.NDArray[np.intp], to_directions=None) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64]]:
     """
-    Helper function to find the best to_point for a given from_point.
+    Finds the best to_point for each of the given from_points. All of the
+    (from_points x to_points) scores are computed at once.
     
     Args:
         from_loop_np: Numpy array of from_loop points
         to_loop_np: Numpy array of to_loop points
-        from_idx: Index of the point in from_loop to evaluate
+        from_indices: Indices of the points in from_loop to evaluate
+        to_directions: get_loop_directions of to_loop, if it is already known
         
     Returns:
-        Tuple of (best_to_idx, score)
+        Tuple of (best_to_indices, scores), one for each from index
     """
-    # Get current point and calculate tangent
-    current_point = from_loop_np[from_idx]
-    next_idx = (from_idx + 1) % len(from_loop_np)
-    next_point = from_loop_np[next_idx]
-    
-    # Calculate tangent direction
-    tangent_vector = next_point - current_point
-    tangent_length = np.linalg.norm(tangent_vector)
-    
-    # Skip if points are too close (tangent undefined)
-    if tangent_length < 1e-6:
-        # Fall back to distance-only evaluation for this point
-        best_to_idx = 0
-        best_dist = float('inf')
-        
-        for to_idx in range(len(to_loop_np)):
-            dist = euclidean(current_point, to_loop_np[to_idx])
-            if dist < best_dist:
-                best_dist = dist
-                best_to_idx = to_idx
-                
-        # Simple distance-based score
-        max_possible_dist = 100  # Arbitrary constant for normalization
-        score = 1 - min(1, best_dist / max_possible_dist)
-        return best_to_idx, score
+    if to_directions is None:
+        to_directions = get_loop_directions(to_loop_np)
+    to_unit_directions, to_direction_defined = to_directions
     
-    # Normalize tangent vector
-    tangent_vector = tangent_vector / tangent_length
+    # Get current points and calculate tangents
+    from_unit_directions, from_direction_defined = get_loop_directions(from_loop_np)
+    tangent_vectors = from_unit_directions[from_indices]
+    tangent_defined = from_direction_defined[from_indices]
     
-    # Find the best match in to_loop
-    best_to_idx = 0
-    best_score = float('-inf')
+    # (from, to) distances
+    offsets = to_loop_np[np.newaxis, :, :] - from_loop_np[from_indices][:, np.newaxis, :]
+    distances = np.sqrt(offsets[:, :, 0] * offsets[:, :, 0] + offsets[:, :, 1] * offsets[:, :, 1])
     
     # Calculate max distance for normalization
-    max_distance = 0
-    for to_point in to_loop_np:
-        dist = euclidean(current_point, to_point)
-        max_distance = max(max_distance, dist)
-    
-    if max_distance == 0:
-        max_distance = 1  # Avoid division by zero
-    
-    # Evaluate against all points in to_loop
-    for to_idx in range(len(to_loop_np)):
-        # Calculate distance score
-        distance = euclidean(current_point, to_loop_np[to_idx])
-        distance_score = 1 - (distance / max_distance)
-        
-        # Calculate angle score
-        to_next_idx = (to_idx + 1) % len(to_loop_np)
-        to_dir = to_loop_np[to_next_idx] - to_loop_np[to_idx]
-        to_dir_length = np.linalg.norm(to_dir)
-        
-        if to_dir_length > 1e-6:
-            to_dir = to_dir / to_dir_length
-            dot_product = np.dot(tangent_vector, to_dir)
-            dot_product = np.clip(dot_product, -1.0, 1.0)
-            angle = math.acos(dot_product)
-            angle_score = 1 - (angle / math.pi)
-        else:
-            angle_score = 0
-        
-        # Combine scores
-        combined_score = 0.5 * distance_score + 0.5 * angle_score
-        
-        if combined_score > best_score:
-            best_score = combined_score
-            best_to_idx = to_idx
+    max_distances = distances.max(axis=1)
+    max_distances[max_distances == 0] = 1  # Avoid division by zero
     
-    return best_to_idx, best_score
+    # Calculate distance scores
+    distance_scores = 1 - (distances / max_distances[:, np.newaxis])
+    
+    # Calculate angle scores
+    dot_products = (tangent_vectors[:, np.newaxis, 0] * to_unit_directions[np.newaxis, :, 0] +
+                    tangent_vectors[:, np.newaxis, 1] * to_unit_directions[np.newaxis, :, 1])
+    angles = np.arccos(np.clip(dot_products, -1.0, 1.0))
+    angle_scores = np.where(to_direction_defined[np.newaxis, :], 1 - (angles / math.pi), 0)
+    
+    # Combine scores
+    combined_scores = 0.5 * distance_scores + 0.5 * angle_scores
+    best_to_indices = np.argmax(combined_scores, axis=1)
+    best_scores = combined_scores[np.arange(len(from_indices)), best_to_indices]
+    
+    # Where the tangent is undefined, fall back to distance-only evaluation
+    if not tangent_defined.all():
+        closest_to_indices = np.argmin(distances, axis=1)
+        closest_distances = distances[np.arange(len(from_indices)), closest_to_indices]
+        max_possible_dist = 100  # Arbitrary constant for normalization
+        best_to_indices = np.where(tangent_defined, best_to_indices, closest_to_indices)
+        best_scores = np.where(tangent_defined, best_scores, 1 - np.minimum(1, closest_distances / max_possible_dist))
+    
+    return best_to_indices, best_scores
+
+
+def find_best_to_point(from_loop_np, to_loop_np, from_idx: int) -> tuple[int, float]:
+    """
+    Helper function to find the best to_point for a given from_point. See
+    find_best_to_points
+        
+    Returns:
+        Tuple of (best_to_idx, score)
+    """
+    best_to_indices, best_scores = find_best_to_points(from_loop_np, to_loop_np, np.array([from_idx]))
+    return int(best_to_indices[0]), float(best_scores[0])
 
 
 
@@ -207,67 +194,199 @@ def find_best_border_transition(from_loop: ContourLoop, to_loop: ContourLoop) ->
 
 
 def find_shortest_transition(from_loop: ContourLoop, to_loop: ContourLoop) -> tuple[int, int]:
-    # Convert loops to numpy arrays
-    from_loop_np = np.array(from_loop.get_vertices())
-    to_loop_np = np.array(to_loop.get_vertices())
+    """
+    Finds the closest pair of vertices between the loops, with one nearest
+    neighbour query of all of from_loop's vertices against to_loop's KD-tree.
+    Between pairs the same distance apart, the one with the lowest from_loop
+    index, then the lowest to_loop index, is used
+    """
+    from_loop_np = from_loop.get_vertices()
+    to_loop_kd_tree = to_loop.get_kd_tree()
     
-    best_dist = float('inf')
-    best_pair = None
+    dists, to_indices = to_loop_kd_tree.query(from_loop_np)
     
-    for i, from_pos in enumerate(from_loop_np):
-        for j, to_pos in enumerate(to_loop_np):
-            dist = euclidean(from_pos, to_pos)
-            if dist >= best_dist:
-                continue
-            best_dist = dist
-            best_pair = (i, j)
-    return best_pair
+    best_from_idx = int(np.argmin(dists))
+    best_dist = dists[best_from_idx]
+    
+    # The KD-tree may give any one of several equally close vertices
+    best_to_indices = to_loop_kd_tree.query_ball_point(from_loop_np[best_from_idx], best_dist)
+    best_to_idx = min(best_to_indices) if len(best_to_indices) > 0 else int(to_indices[best_from_idx])
+    
+    return (best_from_idx, best_to_idx)
 
 
-def generate_tree_spiral_path(root_node: TopographyTreeNode) -> npt.NDArray[np.float64]:
+def find_step_transition(step_pair) -> tuple[int, int]:
+    """
+    Finds where to leave the current loop of a traversal step, and where to
+    enter the loop of the step after it. This only depends on the two loops,
+    so the transitions of a traversal plan can be found in any order
+    
+    Returns:
+        Tuple of (curr_exit_idx, next_enter_idx)
+    """
+    (current_contour_loop, must_complete), (next_contour_loop, _) = step_pair
+    
+    # If they both touch the border, then get a total border traversal
+    if current_contour_loop.touches_border() and next_contour_loop.touches_border():
+        return find_best_border_transition(current_contour_loop, next_contour_loop)
+    elif not must_complete:
+        return find_shortest_transition(current_contour_loop, next_contour_loop)
+    else:
+        return find_best_transition(current_contour_loop.get_vertices(), next_contour_loop.get_vertices())
+
+
+def generate_tree_spiral_path(root_node: TopographyTreeNode, workers: int = 1, return_segments: bool = False):
     """
     Walks the given tree and creates a single continuous path that traverses
     all the contours.
     
+    With more than one worker, the transitions between the steps of the
+    traversal plan are found ahead of time in a thread pool. The path is
+    still stitched together in order, so it is the same for any number of
+    workers
+    
     Returns numpy array (nx2):
         Each row contians an (x,y) position in millimeters
+    
+    If return_segments is set, returns (path, segment_offsets, segment_steps).
+    Segment i of the path is path[segment_offsets[i]:segment_offsets[i + 1]],
+    and comes from the loop of step segment_steps[i] of unravel_tree
+    """
+    
+    logger.info("Unraveling tree of size {}".format(root_node.get_size()))
+    
+    traversal_order = root_node.unravel_tree()
+    segments = list(_iter_traversal_segments(traversal_order, workers))
+    
+    path, segment_offsets = _gather_path_segments(traversal_order, segments)
+    
+    logger.info("Completed tree traversal of {} steps".format(len(traversal_order)))
+    
+    if return_segments:
+        return path, segment_offsets, np.array([step_idx for step_idx, _, _ in segments], dtype=np.intp)
+    return path
+
+
+def iter_tree_spiral_path(root_node: TopographyTreeNode, workers: int = 1, chunk_size: int = PATH_CHUNK_SIZE) -> Iterator[npt.NDArray]:
+    """
+    Walks the given tree like generate_tree_spiral_path, but yields the path
+    in chunks of at most chunk_size positions as it goes, instead of all at
+    once. Joined together, the chunks are the same path
     """
     
-    path = []
+    logger.info("Unraveling tree of size {}".format(root_node.get_size()))
     
     traversal_order = root_node.unravel_tree()
+    dtype = _get_path_dtype(traversal_order)
     
-    logger.info("Unraveled tree of size {} into a traversal plan of length {}".format(root_node.get_size(), len(traversal_order)))
+    chunk = np.empty((chunk_size, 2), dtype=dtype)
+    num_filled = 0
     
+    for step_idx, start_idx, num_vertices in _iter_traversal_segments(traversal_order, workers):
+        vertices = traversal_order[step_idx][0].get_vertices()
+        
+        # A segment can be split across chunks
+        while num_vertices > 0:
+            num_taken = min(num_vertices, chunk_size - num_filled)
+            _gather_segment(vertices, start_idx, num_taken, chunk[num_filled:num_filled + num_taken])
+            start_idx += num_taken
+            num_vertices -= num_taken
+            num_filled += num_taken
+            
+            if num_filled == chunk_size:
+                yield chunk
+                # The last chunk may still be in use, so it is not reused
+                chunk = np.empty((chunk_size, 2), dtype=dtype)
+                num_filled = 0
+    
+    if num_filled > 0:
+        yield chunk[:num_filled]
+    
+    logger.info("Completed tree traversal of {} steps".format(len(traversal_order)))
+
+
+def _iter_traversal_segments(traversal_order, workers: int):
+    """
+    Finds the transitions between the steps of the traversal plan, and
+    yields the segments of the path they make. See _iter_path_segments
+    """
+    step_pairs = list(zip(traversal_order, traversal_order[1:]))
+    
+    if workers > 1:
+        logger.debug("Finding {} transitions with {} workers...".format(len(step_pairs), workers))
+        # Threads share the loops and their cached KD-trees. The searches
+        # spend most of their time in numpy and scipy, which let go of the GIL
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from _iter_path_segments(step_pairs, executor.map(find_step_transition, step_pairs))
+    else:
+        yield from _iter_path_segments(step_pairs, map(find_step_transition, step_pairs))
+
+
+def _iter_path_segments(step_pairs, transitions):
+    """
+    Joins the loops of the traversal plan together at the given transitions,
+    which are in the same order as step_pairs. Nothing is copied, each part
+    of the path is yielded as (step_idx, start_idx, num_vertices), which is
+    num_vertices of the step's loop starting at start_idx and wrapping round
+    """
     next_enter_idx: int = None
     
-    for i in range(len(traversal_order) - 1):
+    for step_idx, (((current_contour_loop, must_complete), _), (curr_exit_idx, transition_enter_idx)) in enumerate(zip(step_pairs, transitions)):
         
         curr_enter_idx = next_enter_idx
+        next_enter_idx = transition_enter_idx
         
-        current_contour_loop, must_complete = traversal_order[i]
-        next_contour_loop, _ = traversal_order[i+1]
-        
-        
-        # If they both touch the border, then get a total border traversal
-        if current_contour_loop.touches_border() and next_contour_loop.touches_border():
-            curr_exit_idx, next_enter_idx = find_best_border_transition(current_contour_loop, next_contour_loop)
-        elif not must_complete:
-            curr_exit_idx, next_enter_idx = find_shortest_transition(current_contour_loop, next_contour_loop)
-        else:
-            curr_exit_idx, next_enter_idx = find_best_transition(current_contour_loop.get_vertices(), next_contour_loop.get_vertices())
+        num_curr_vertices = len(current_contour_loop.get_vertices())
         
         if curr_enter_idx is None:
-            path.extend(np.roll(current_contour_loop.get_vertices(), -(curr_exit_idx+1), axis=0))
+            yield step_idx, int(curr_exit_idx) + 1, num_curr_vertices
             continue
         
         if must_complete:
-            path.extend(np.roll(current_contour_loop.get_vertices(), -(curr_enter_idx), axis=0))
+            yield step_idx, int(curr_enter_idx), num_curr_vertices
         
-        num_curr_vertices = len(current_contour_loop.get_vertices())
         circ_length = (curr_exit_idx - curr_enter_idx + num_curr_vertices + 1) % num_curr_vertices
-        path.extend(np.roll(current_contour_loop.get_vertices(), -(curr_enter_idx), axis=0)[:circ_length])
+        if circ_length > 0:
+            yield step_idx, int(curr_enter_idx), int(circ_length)
+
+
+def _get_path_dtype(traversal_order) -> np.dtype:
+    """
+    The same type np.array would give for the vertices of all of the loops
+    the path is made from. The loop of the last step is never used
+    """
+    loop_dtypes = {contour_loop.get_vertices().dtype for contour_loop, _ in traversal_order[:-1]}
+    if len(loop_dtypes) == 0:
+        return np.dtype(np.float64)
+    return np.result_type(*loop_dtypes)
 
-    logger.info("Completed tree traversal")
 
-    return np.array(path)
+def _gather_segment(vertices, start_idx: int, num_vertices: int, out: npt.NDArray) -> None:
+    """
+    Copies num_vertices of the loop, starting at start_idx and wrapping round,
+    into out, with a single gather of modular indices
+    """
+    vertex_indices = np.arange(start_idx, start_idx + num_vertices) % len(vertices)
+    if vertices.dtype == out.dtype:
+        np.take(vertices, vertex_indices, axis=0, out=out)
+    else:
+        # take can only gather into an array of the same type
+        out[:] = vertices[vertex_indices]
+
+
+def _gather_path_segments(traversal_order, segments) -> tuple[npt.NDArray, npt.NDArray[np.intp]]:
+    """
+    Copies the path segments into one preallocated (N, 2) array
+    
+    Returns:
+        Tuple of (path, segment_offsets)
+    """
+    segment_offsets = np.zeros(len(segments) + 1, dtype=np.intp)
+    np.cumsum([num_vertices for _, _, num_vertices in segments], out=segment_offsets[1:])
+    
+    path = np.empty((segment_offsets[-1], 2), dtype=_get_path_dtype(traversal_order))
+    
+    for (step_idx, start_idx, num_vertices), path_start in zip(segments, segment_offsets):
+        _gather_segment(traversal_order[step_idx][0].get_vertices(), start_idx, num_vertices, path[path_start:path_start + num_vertices])
+    
+    return path, segment_offsets
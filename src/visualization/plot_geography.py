@@ -56,7 +56,7 @@ def plot_topography_contours(lons_line_space, lats_line_space, elevation_data, b
     return contour_lines
 
 
-def visualize_topography_with_lakes(bbox: GeoBoundingBox, elevation_data: npt.NDArray[np.float64], lakes_gdf, debug_img_dir: str):
+def visualize_topography_with_lakes(bbox: GeoBoundingBox, elevation_data: npt.NDArray, lakes_gdf, debug_img_dir: str):
     """
     Visualize topography data with lakes and their areas.
     """
@@ -2,18 +2,27 @@
 
 from PIL import Image, ImageDraw
 from matplotlib.path import Path
-from typing import List, Union
+from typing import Iterable, List, Union
 from src.spacial.table_dimention import Table_Dimention
 from src.contour_calculation.contour_loop import ContourLoop
+from src.contour_calculation.contour_fragments import ContourFragments
 import numpy as np
+import numpy.typing as npt
 import os
 from src.logger import get_logger
 import logging
 
 logger = get_logger("visualize", logging.DEBUG)
 
+IMAGE_SCALE = 4 # pixels per mm
+IMAGE_BUFFER = 5 # buffer in mm
 
-def draw_contour_on_image(img_draw: ImageDraw, contour_path: Union[Path, ContourLoop], height_mm: int, scale: float, buffer: int):
+
+def draw_contour_on_image(img_draw: ImageDraw, contour_path: Union[Path, ContourLoop], height_mm: int, scale: float, buffer: int, start_idx: int = 0, num_vertices: int = None):
+    """
+    Draws the path, colored from start to end. A part of a longer path is
+    drawn by giving where it starts in the path, and how long the path is
+    """
     
     if type(contour_path) is Path:
         path_vertices = contour_path.vertices
@@ -26,11 +35,14 @@ def draw_contour_on_image(img_draw: ImageDraw, contour_path: Union[Path, Contour
     else:
         raise Exception("Unexpected type {}".format(type(contour_path)))
     
+    if num_vertices is None:
+        num_vertices = len(path_vertices)
+    
     for i in range(len(path_vertices) - 1):
         
         color = (
             255,
-            int((1 - (i / len(path_vertices))) * 255),
+            int((1 - ((start_idx + i) / num_vertices)) * 255),
             0
         )
         
@@ -45,10 +57,10 @@ def draw_contour_on_image(img_draw: ImageDraw, contour_path: Union[Path, Contour
         img_draw.line((x0, y0, x1, y1), fill=color, width = (scale // 2))
     
 
-def dump_contour_image(image_name: str, contours: List[Path], table_dim: Table_Dimention):
+def dump_contour_image(image_name: str, contours: Union[List[Path], ContourFragments], table_dim: Table_Dimention):
     
-    SCALE = 4 # pixels per mm
-    BUFFER = 5 # buffer in mm
+    SCALE = IMAGE_SCALE
+    BUFFER = IMAGE_BUFFER
     
     width = int(table_dim.get_width_mm() + BUFFER + BUFFER) * SCALE
     height = int(table_dim.get_height_mm() + BUFFER + BUFFER) * SCALE
@@ -60,7 +72,10 @@ def dump_contour_image(image_name: str, contours: List[Path], table_dim: Table_D
         logger.error("Can not dump image with no contours")
         return
     
-    if type(contours[0]) is Path or type(contours[0]) is ContourLoop:
+    if type(contours) is ContourFragments:
+        for i in range(len(contours)):
+            draw_contour_on_image(img_draw, contours.get_fragment_vertices(i), table_dim.get_height_mm(), SCALE, BUFFER)
+    elif type(contours[0]) is Path or type(contours[0]) is ContourLoop:
         for contour in contours:
             draw_contour_on_image(img_draw, contour, table_dim.get_height_mm(), SCALE, BUFFER)
     else:
@@ -72,6 +87,39 @@ def dump_contour_image(image_name: str, contours: List[Path], table_dim: Table_D
         logger.error("Could not write contour image: {}".format(err))
 
 
+def dump_path_image(image_name: str, path_chunks: Iterable[npt.NDArray[np.float64]], num_vertices: int, table_dim: Table_Dimention):
+    """
+    Draws the same image as dump_contour_image of a path, from the path in
+    chunks. Only one chunk is needed at a time
+    """
+    
+    width = int(table_dim.get_width_mm() + IMAGE_BUFFER + IMAGE_BUFFER) * IMAGE_SCALE
+    height = int(table_dim.get_height_mm() + IMAGE_BUFFER + IMAGE_BUFFER) * IMAGE_SCALE
+    
+    img = Image.new("RGB", (width, height))
+    img_draw = ImageDraw.Draw(img)
+    
+    if num_vertices == 0:
+        logger.error("Can not dump image with no contours")
+        return
+    
+    chunk_start = 0
+    last_point = None
+    for path_chunk in path_chunks:
+        if last_point is None:
+            draw_contour_on_image(img_draw, path_chunk, table_dim.get_height_mm(), IMAGE_SCALE, IMAGE_BUFFER, start_idx=0, num_vertices=num_vertices)
+        else:
+            # Join it up to the end of the last chunk
+            draw_contour_on_image(img_draw, np.concatenate(([last_point], path_chunk)), table_dim.get_height_mm(), IMAGE_SCALE, IMAGE_BUFFER, start_idx=chunk_start - 1, num_vertices=num_vertices)
+        chunk_start += len(path_chunk)
+        last_point = path_chunk[-1]
+    
+    try:
+        img.save(image_name)
+    except OSError as err:
+        logger.error("Could not write contour image: {}".format(err))
+
+
 def dump_multiple_contour_images(debug_image_dir: str, image_base_name: str, contours: List, table_dim: Table_Dimention):
     
     logger.debug("Dumping {} contour images [basename {}]...".format(len(contours), image_base_name))
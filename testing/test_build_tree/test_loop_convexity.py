@@ -1,6 +1,7 @@
 
 from src.topography_tree.build_topography_tree import is_contour_loop_convex
 from src.contour_calculation.contour_loop import ContourLoop
+from src.contour_calculation.loop_store import LoopStore
 
 
 def test_convex_loop():
@@ -23,4 +24,15 @@ def test_concave_loop():
     is_convex = is_contour_loop_convex(loop)
     
     assert is_convex == False
-    
\ No newline at end of file
+    
+
+def test_store_direction_matches_loops():
+    loops = [
+        ContourLoop([(0, 0), (0, 1), (1, 1), (1, 0)]),
+        ContourLoop([(0, 0), (1, 0), (1, 1), (0, 1)]),
+        ContourLoop([(5, 5), (5, 9), (6, 6), (9, 9), (9, 5)]),
+    ]
+
+    store = LoopStore.from_loop_layers([loops])
+
+    assert store.clockwise.tolist() == [is_contour_loop_convex(loop) for loop in loops]
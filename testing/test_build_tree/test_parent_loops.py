@@ -0,0 +1,47 @@
+
+import numpy as np
+from src.contour_calculation.contour_loop import ContourLoop
+from src.spacial.table_dimention import Table_Dimention
+from src.topography_tree.build_topography_tree import find_parent_loops, build_topography_tree
+
+
+def _get_square_loop(x, y, size, clockwise=True):
+    vertices = [(x, y), (x, y + size), (x + size, y + size), (x + size, y)]
+    if not clockwise:
+        vertices = vertices[::-1]
+    return ContourLoop(vertices)
+
+
+def test_find_parent_loops():
+    loops = [
+        _get_square_loop(0, 0, 100),
+        _get_square_loop(10, 10, 50),
+        _get_square_loop(20, 20, 10),
+        _get_square_loop(200, 0, 30),
+        _get_square_loop(70, 70, 20),
+    ]
+
+    recv_parent_loop_idx = find_parent_loops(loops)
+
+    assert recv_parent_loop_idx.tolist() == [-1, 0, 1, -1, 0]
+
+
+def test_find_parent_loops_no_loops():
+    recv_parent_loop_idx = find_parent_loops([])
+
+    assert len(recv_parent_loop_idx) == 0
+
+
+def test_basin_is_nested():
+    table_dim = Table_Dimention(300, 200)
+    hill = _get_square_loop(10, 10, 150)
+    # A depression in the side of the hill, from a lower level
+    basin = _get_square_loop(20, 20, 30, clockwise=False)
+    summit = _get_square_loop(100, 100, 40)
+
+    topo_tree = build_topography_tree([[basin], [hill], [summit]], table_dim)
+
+    assert len(topo_tree.children) == 1
+    hill_node = topo_tree.children[0]
+    assert hill_node.loop is hill
+    assert [child.loop for child in hill_node.children] == [basin, summit]
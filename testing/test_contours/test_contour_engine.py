@@ -0,0 +1,46 @@
+
+import numpy as np
+import matplotlib.pyplot as plt
+from src.spacial.table_dimention import Table_Dimention
+from src.contour_calculation.topographic_contours import get_contour_lines, get_contour_levels, get_contours
+
+
+def _generate_test_elevation_data(width, height):
+    x = np.linspace(0, 4 * np.pi, width)
+    y = np.linspace(0, 2 * np.pi, height)
+    x_grid, y_grid = np.meshgrid(x, y)
+    return (100 * np.sin(x_grid) * np.cos(y_grid) + 20 * x_grid).astype(np.int16)
+
+
+def test_contour_lines_match_matplotlib():
+    elevation_data = _generate_test_elevation_data(120, 60)
+    x_line_space = np.linspace(0, 200, elevation_data.shape[1])
+    y_line_space = np.linspace(100, 0, elevation_data.shape[0])
+    levels = get_contour_levels(elevation_data, 15)
+
+    recv_lines = get_contour_lines(elevation_data, x_line_space, y_line_space, levels)
+
+    fig, ax = plt.subplots()
+    exp_lines = ax.contour(x_line_space, y_line_space, elevation_data, levels=levels).allsegs
+    plt.close(fig)
+
+    assert len(recv_lines) == len(exp_lines)
+    for (vertices, offsets), exp_level_lines in zip(recv_lines, exp_lines):
+        # matplotlib gives an empty line for a level with no lines
+        exp_level_lines = [exp_line for exp_line in exp_level_lines if len(exp_line) > 0]
+        assert len(offsets) == len(exp_level_lines) + 1
+        for start_idx, end_idx, exp_line in zip(offsets[:-1], offsets[1:], exp_level_lines):
+            assert np.array_equal(vertices[start_idx:end_idx], exp_line)
+
+
+def test_closed_loops_are_marked():
+    table_dim = Table_Dimention(100, 100)
+    # A single hill in the middle, so every contour is a closed loop
+    x_grid, y_grid = np.meshgrid(np.linspace(-1, 1, 50), np.linspace(-1, 1, 50))
+    elevation_data = 1000 * np.exp(-4 * (x_grid ** 2 + y_grid ** 2))
+
+    contours = get_contours(elevation_data, table_dim, 6)
+
+    assert len(contours) > 0
+    for fragments in contours:
+        assert np.all(fragments.closed)
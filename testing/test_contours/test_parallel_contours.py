@@ -0,0 +1,52 @@
+
+import numpy as np
+from src.spacial.table_dimention import Table_Dimention
+from src.geography_to_gcode import convert_elevation_data_to_path
+from src.contour_calculation.topographic_contours import get_contours
+from src.contour_calculation.loop_closer import merge_all_loop_fragments
+from src.contour_calculation.parallel_contours import get_contour_loops_parallel
+
+
+def _generate_test_elevation_data(rows, cols):
+    x_grid, y_grid = np.meshgrid(np.linspace(-5, 5, cols), np.linspace(-5, 5, rows))
+    # A few hills, so there are both closed loops and fragments cut by the border
+    return (np.exp(-((x_grid - 2) ** 2 + (y_grid - 2) ** 2) / 4) * 300 +
+            np.exp(-((x_grid + 3) ** 2 + (y_grid + 1) ** 2) / 2) * 200 +
+            np.exp(-((x_grid - 4) ** 2 + (y_grid + 4) ** 2) / 6) * 250)
+
+
+def _get_loop_coords(all_contours):
+    return [[loop.vertices for loop in contour_loops] for contour_loops in all_contours]
+
+
+def test_parallel_matches_serial():
+    table_dim = Table_Dimention(150, 100)
+    elevation_data = _generate_test_elevation_data(100, 150)
+
+    exp_fragments_list = get_contours(elevation_data, table_dim, 20)
+    exp_contours = merge_all_loop_fragments(exp_fragments_list, table_dim)
+    recv_fragments_list, recv_contours = get_contour_loops_parallel(elevation_data, table_dim, 20, workers=2)
+
+    assert len(recv_fragments_list) == len(exp_fragments_list)
+    for recv_fragments, exp_fragments in zip(recv_fragments_list, exp_fragments_list):
+        assert np.array_equal(recv_fragments.vertices, exp_fragments.vertices)
+        assert np.array_equal(recv_fragments.offsets, exp_fragments.offsets)
+        assert np.array_equal(recv_fragments.closed, exp_fragments.closed)
+
+    recv_coords = _get_loop_coords(recv_contours)
+    exp_coords = _get_loop_coords(exp_contours)
+    assert len(recv_coords) == len(exp_coords)
+    for recv_level_coords, exp_level_coords in zip(recv_coords, exp_coords):
+        assert len(recv_level_coords) == len(exp_level_coords)
+        for recv_loop_coords, exp_loop_coords in zip(recv_level_coords, exp_level_coords):
+            assert np.array_equal(recv_loop_coords, exp_loop_coords)
+
+
+def test_parallel_path_matches_serial():
+    table_dim = Table_Dimention(150, 100)
+    elevation_data = _generate_test_elevation_data(100, 150)
+
+    exp_path = convert_elevation_data_to_path(elevation_data, table_dim)
+    recv_path = convert_elevation_data_to_path(elevation_data, table_dim, workers=3)
+
+    assert np.array_equal(recv_path, exp_path)
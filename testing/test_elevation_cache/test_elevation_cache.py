@@ -0,0 +1,59 @@
+
+import os
+import numpy as np
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.elevation_cache import ElevationCache, get_cache_key
+
+
+def _write_test_file(file_path, contents=b"elevation"):
+    with open(file_path, "wb") as file:
+        file.write(contents)
+    return str(file_path)
+
+
+def test_store_and_load(tmp_path):
+    elevation_cache = ElevationCache(str(tmp_path / "cache"))
+    elevation_data = np.arange(12, dtype=np.int16).reshape(3, 4)
+
+    elevation_cache.store("key", elevation_data)
+    recv_elevation_data = elevation_cache.load("key")
+
+    assert np.array_equal(recv_elevation_data, elevation_data)
+    assert recv_elevation_data.dtype == elevation_data.dtype
+
+
+def test_load_missing(tmp_path):
+    elevation_cache = ElevationCache(str(tmp_path / "cache"))
+
+    assert elevation_cache.load("key") is None
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    elevation_data = np.zeros((10, 10), dtype=np.int16)
+    # Room for two arrays, plus their .npy headers
+    elevation_cache = ElevationCache(str(tmp_path / "cache"), max_size_bytes=2 * elevation_data.nbytes + 512)
+
+    elevation_cache.store("key_0", elevation_data)
+    elevation_cache.store("key_1", elevation_data)
+    os.utime(tmp_path / "cache" / "key_0.npy", ns=(0, 0))
+    os.utime(tmp_path / "cache" / "key_1.npy", ns=(1, 1))
+    # Using key_0 makes key_1 the least recently used
+    elevation_cache.load("key_0")
+    elevation_cache.store("key_2", elevation_data)
+
+    assert elevation_cache.load("key_0") is not None
+    assert elevation_cache.load("key_1") is None
+    assert elevation_cache.load("key_2") is not None
+
+
+def test_key_changes_with_inputs(tmp_path):
+    file_path = _write_test_file(tmp_path / "tile.tif")
+    bbox = GeoBoundingBox(44.3, -71.8, 44.1, -71.55)
+
+    key = get_cache_key([file_path], bbox, None)
+
+    assert get_cache_key([file_path], bbox, None) == key
+    assert get_cache_key([file_path], bbox, (10, 10)) != key
+    assert get_cache_key([file_path], GeoBoundingBox(44.3, -71.8, 44.1, -71.5), None) != key
+    os.utime(file_path, ns=(0, 0))
+    assert get_cache_key([file_path], bbox, None) != key
@@ -0,0 +1,89 @@
+
+import numpy as np
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.mask import mask
+from rasterio.merge import merge
+from rasterio.transform import from_origin
+from shapely.geometry import box
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.elevation_extraction import get_srtm_elevation_data
+
+
+def _write_test_tile(file_path, lat, lon, size=601):
+    # Pixel centers fall on the whole degree grid lines, like SRTM data
+    res = 1 / (size - 1)
+    rows, cols = np.mgrid[0:size, 0:size]
+    elevations = (rows * 7 + cols * 3) % 1000 + 1
+    transform = from_origin(lon - res / 2, lat + 1 + res / 2, res, res)
+    with rasterio.open(file_path, "w", driver="GTiff", height=size, width=size, count=1,
+                       dtype="int16", crs="EPSG:4326", transform=transform) as dst:
+        dst.write(elevations.astype(np.int16), 1)
+    return str(file_path)
+
+
+def test_full_resolution_matches_mask(tmp_path):
+    file_path = _write_test_tile(tmp_path / "tile.tif", 44, -72)
+    bbox = GeoBoundingBox(44.3, -71.8, 44.1, -71.55)
+
+    recv_elevations = get_srtm_elevation_data(file_path, bbox)
+
+    with rasterio.open(file_path) as src:
+        exp_elevations, _ = mask(src, [box(*bbox.get_all_values_tuple())], crop=True, all_touched=True)
+
+    assert np.array_equal(recv_elevations, exp_elevations[0])
+
+
+def test_decimated_read(tmp_path):
+    file_path = _write_test_tile(tmp_path / "tile.tif", 44, -72)
+    bbox = GeoBoundingBox(44.3, -71.8, 44.1, -71.55)
+
+    recv_elevations = get_srtm_elevation_data(file_path, bbox, sample_shape=(40, 60))
+
+    assert recv_elevations.shape == (40, 60)
+
+
+def test_decimated_read_does_not_upsample(tmp_path):
+    file_path = _write_test_tile(tmp_path / "tile.tif", 44, -72)
+    bbox = GeoBoundingBox(44.3, -71.8, 44.1, -71.55)
+
+    full_elevations = get_srtm_elevation_data(file_path, bbox)
+    recv_elevations = get_srtm_elevation_data(file_path, bbox, sample_shape=(10000, 20))
+
+    assert recv_elevations.shape == (full_elevations.shape[0], 20)
+
+
+def test_mosaic_matches_merge(tmp_path):
+    file_paths = [
+        _write_test_tile(tmp_path / "tile_0.tif", 44, -72),
+        _write_test_tile(tmp_path / "tile_1.tif", 44, -71),
+        _write_test_tile(tmp_path / "tile_2.tif", 43, -72),
+        _write_test_tile(tmp_path / "tile_3.tif", 43, -71),
+    ]
+    bbox = GeoBoundingBox(44.05, -71.1, 43.9, -70.9)
+
+    recv_elevations = get_srtm_elevation_data(file_paths, bbox)
+
+    sources = [rasterio.open(file_path) for file_path in file_paths]
+    mosaic, mosaic_transform = merge(sources)
+    for src in sources:
+        src.close()
+    with MemoryFile() as memfile:
+        with memfile.open(driver="GTiff", height=mosaic.shape[1], width=mosaic.shape[2], count=1,
+                          dtype=mosaic.dtype, crs="EPSG:4326", transform=mosaic_transform) as merged:
+            merged.write(mosaic)
+            exp_elevations, _ = mask(merged, [box(*bbox.get_all_values_tuple())], crop=True, all_touched=True)
+
+    assert np.array_equal(recv_elevations, exp_elevations[0])
+
+
+def test_read_as_dtype(tmp_path):
+    file_path = _write_test_tile(tmp_path / "tile.tif", 44, -72)
+    bbox = GeoBoundingBox(44.3, -71.8, 44.1, -71.55)
+
+    exp_elevations = get_srtm_elevation_data(file_path, bbox)
+    recv_elevations = get_srtm_elevation_data(file_path, bbox, dtype="float32")
+
+    assert exp_elevations.dtype == np.int16
+    assert recv_elevations.dtype == np.float32
+    assert np.array_equal(recv_elevations, exp_elevations)
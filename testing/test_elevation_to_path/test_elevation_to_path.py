@@ -1,6 +1,6 @@
 
 from src.spacial.table_dimention import Table_Dimention
-from src.geography_to_gcode import convert_elevation_data_to_path
+from src.geography_to_gcode import convert_elevation_data_to_path, iter_elevation_data_to_path
 from src.visualization.visualize_contour import dump_contour_image
 import numpy as np
 
@@ -51,3 +51,15 @@ def test_basic_closer_contours():
     assert np.allclose(recv_path[1000], np.array([75.53762393, 53.76884422]))
     assert np.allclose(recv_path[3000], np.array([121.80924486,  64.8241206]))
     assert np.allclose(recv_path[7000], np.array([0,  100]))
+
+
+def test_streamed_path():
+    
+    table_dim = Table_Dimention(150, 150, circular=True)
+    elevation_data = _generate_interesting_elevation_data(table_dim.get_width_mm(), table_dim.get_height_mm())
+    
+    expt_path = convert_elevation_data_to_path(elevation_data, table_dim)
+    recv_chunks = list(iter_elevation_data_to_path(elevation_data, table_dim, chunk_size=500))
+    
+    assert len(recv_chunks) > 1
+    assert np.array_equal(np.concatenate(recv_chunks), expt_path)
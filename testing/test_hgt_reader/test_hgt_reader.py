@@ -0,0 +1,58 @@
+
+import numpy as np
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.elevation_extraction import get_srtm_elevation_data
+from src.geography_input.hgt_reader import read_hgt_elevation_data
+
+# GDAL only recognizes .hgt files of the standard sizes
+SAMPLES = 1201
+
+
+def _write_test_hgt(tile_dir, lat, lon):
+    file_name = "{}{:02d}{}{:03d}.hgt".format("N" if lat >= 0 else "S", abs(lat), "E" if lon >= 0 else "W", abs(lon))
+    # Make the values depend on the location, so the shared edges between tiles match
+    rows, cols = np.mgrid[0:SAMPLES, 0:SAMPLES]
+    lats = lat + 1 - rows / (SAMPLES - 1)
+    lons = lon + cols / (SAMPLES - 1)
+    elevations = 1000 + 300 * np.sin(lons * 20) + 200 * np.cos(lats * 30)
+    file_path = str(tile_dir / file_name)
+    elevations.astype(">i2").tofile(file_path)
+    return file_path
+
+
+def test_single_tile_matches_rasterio(tmp_path):
+    file_paths = [_write_test_hgt(tmp_path, 44, -72)]
+    bbox = GeoBoundingBox(44.3, -71.9, 44.1, -71.5)
+
+    recv_elevations = read_hgt_elevation_data(file_paths, bbox)
+    exp_elevations = get_srtm_elevation_data(file_paths, bbox)
+
+    assert np.array_equal(recv_elevations, exp_elevations)
+
+
+def test_mosaic_matches_rasterio(tmp_path):
+    file_paths = [
+        _write_test_hgt(tmp_path, 44, -72),
+        _write_test_hgt(tmp_path, 44, -71),
+        _write_test_hgt(tmp_path, 43, -72),
+        _write_test_hgt(tmp_path, 43, -71),
+    ]
+    bbox = GeoBoundingBox(43.9, -71.1, 44.1, -70.9)
+
+    recv_elevations = read_hgt_elevation_data(file_paths, bbox)
+    exp_elevations = get_srtm_elevation_data(file_paths, bbox)
+
+    assert np.array_equal(recv_elevations, exp_elevations)
+
+
+def test_mosaic_with_missing_tile_matches_rasterio(tmp_path):
+    file_paths = [
+        _write_test_hgt(tmp_path, 44, -72),
+        _write_test_hgt(tmp_path, 43, -71),
+    ]
+    bbox = GeoBoundingBox(43.9, -71.1, 44.1, -70.9)
+
+    recv_elevations = read_hgt_elevation_data(file_paths, bbox)
+    exp_elevations = get_srtm_elevation_data(file_paths, bbox)
+
+    assert np.array_equal(recv_elevations, exp_elevations)
@@ -0,0 +1,35 @@
+
+import numpy as np
+from shapely.geometry import Polygon
+from src.contour_calculation.contour_loop import ContourLoop
+
+
+def _get_star_vertices(num_points, dtype):
+    angles = np.linspace(0, 2 * np.pi, 2 * num_points, endpoint=False)
+    radii = np.where(np.arange(2 * num_points) % 2 == 0, 50, 20)
+    return np.stack((100 + radii * np.cos(angles), 80 + radii * np.sin(angles)), axis=1).astype(dtype)
+
+
+def test_area_matches_polygon():
+    vertices = _get_star_vertices(7, np.float64)
+    loop = ContourLoop(vertices)
+
+    assert np.isclose(loop.get_area(), Polygon(vertices).area)
+    # Same area in the other direction
+    assert np.isclose(ContourLoop(vertices[::-1]).get_area(), Polygon(vertices).area)
+
+
+def test_float_vertices_are_not_copied():
+    for dtype in (np.float32, np.float64):
+        vertices = _get_star_vertices(5, dtype)
+        loop = ContourLoop(vertices)
+        assert loop.get_vertices() is vertices
+
+
+def test_contains():
+    loop = ContourLoop(_get_star_vertices(5, np.float32))
+
+    assert loop.contains((100, 80))
+    # On the boundary
+    assert loop.contains((150, 80))
+    assert not loop.contains((0, 0))
@@ -0,0 +1,75 @@
+
+import numpy as np
+from src.contour_calculation.contour_loop import ContourLoop
+from src.contour_calculation.loop_store import LoopStore
+
+
+def _get_square_loop(x, y, size, border_indices=None):
+    return ContourLoop([(x, y), (x, y + size), (x + size, y + size), (x + size, y)], border_indices=border_indices)
+
+
+def _get_test_loop_layers():
+    return [
+        [_get_square_loop(0, 0, 100, border_indices=[0, 1, 3]), _get_square_loop(150, 10, 40)],
+        [],
+        [_get_square_loop(10, 10, 20)],
+    ]
+
+
+def _assert_loops_equal(recv_loops, exp_loops):
+    assert len(recv_loops) == len(exp_loops)
+    for recv_loop, exp_loop in zip(recv_loops, exp_loops):
+        assert recv_loop == exp_loop
+        assert np.array_equal(recv_loop.get_sample_vertex(), exp_loop.get_sample_vertex())
+        assert np.isclose(recv_loop.get_area(), exp_loop.get_area())
+
+
+def test_from_loop_layers():
+    loop_layers = _get_test_loop_layers()
+
+    store = LoopStore.from_loop_layers(loop_layers)
+
+    # The empty level is left out
+    assert len(store) == 2
+    assert store.get_num_loops() == 3
+    assert store.level_ids.tolist() == [0, 0, 1]
+    assert store.touches_border.tolist() == [True, False, False]
+    assert np.array_equal(store.bboxes[1], [150, 10, 190, 50])
+    _assert_loops_equal(store[0], loop_layers[0])
+    _assert_loops_equal(store[1], loop_layers[2])
+
+
+def test_loops_are_views():
+    store = LoopStore.from_loop_layers(_get_test_loop_layers())
+
+    loop = store.get_loop(1)
+
+    assert np.shares_memory(loop.get_vertices(), store.vertices)
+
+
+def test_concatenate():
+    loop_layers = _get_test_loop_layers()
+
+    store = LoopStore.concatenate([
+        LoopStore.from_loop_layers([loop_layers[0]]),
+        LoopStore.from_loop_layers([]),
+        LoopStore.from_loop_layers([loop_layers[2]]),
+    ])
+
+    exp_store = LoopStore.from_loop_layers(loop_layers)
+    assert len(store) == len(exp_store)
+    for recv_level, exp_level in zip(store, exp_store):
+        _assert_loops_equal(recv_level, exp_level)
+    assert np.array_equal(store.border_offsets, exp_store.border_offsets)
+
+
+def test_save_and_load(tmp_path):
+    store = LoopStore.from_loop_layers(_get_test_loop_layers())
+
+    store.save(str(tmp_path / "loops"))
+    loaded_store = LoopStore.load(str(tmp_path / "loops"))
+
+    assert isinstance(loaded_store.vertices, np.memmap)
+    assert len(loaded_store) == len(store)
+    for recv_level, exp_level in zip(loaded_store, store):
+        _assert_loops_equal(recv_level, exp_level)
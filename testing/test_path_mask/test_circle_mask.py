@@ -0,0 +1,36 @@
+import numpy as np
+from src.spacial.table_dimention import Table_Dimention
+from src.path_post_processing.path_mask import CircleMask, crop_path_to_circle
+from src.path_post_processing.path_utils import get_total_length
+
+
+def _generate_test_path():
+    # A spiral that goes in and out of the circle a few times
+    angles = np.linspace(0, 12 * np.pi, 2000)
+    radii = 60 + 45 * np.sin(angles * 1.3)
+    return np.stack((100 + radii * np.cos(angles), 100 + radii * np.sin(angles)), axis=1)
+
+
+def test_chunked_crop_matches_whole_path():
+    table_dim = Table_Dimention(200, 200, circular=True)
+    path = _generate_test_path()
+
+    expt_path = crop_path_to_circle(path, table_dim)
+
+    for chunk_size in [1, 7, 500, 5000]:
+        circle_mask = CircleMask(table_dim)
+        recv_chunks = [circle_mask.crop(path[i:i + chunk_size]) for i in range(0, len(path), chunk_size)]
+        assert np.array_equal(np.concatenate(recv_chunks), expt_path)
+
+
+def test_chunked_total_length():
+    path = _generate_test_path()
+
+    recv_dist_mm = 0
+    previous_point = None
+    for i in range(0, len(path), 300):
+        path_chunk = path[i:i + 300]
+        recv_dist_mm = get_total_length(path_chunk, start_dist_mm=recv_dist_mm, previous_point=previous_point)
+        previous_point = path_chunk[-1]
+
+    assert recv_dist_mm == get_total_length(path)
@@ -0,0 +1,55 @@
+
+import numpy as np
+import pytest
+from src.spacial.table_dimention import Table_Dimention
+
+
+def _get_border_locations(table_dim, num_locations, rng):
+    width = table_dim.get_width_mm()
+    height = table_dim.get_height_mm()
+    along = rng.uniform(0, 1, num_locations)
+    side = rng.integers(0, 4, num_locations)
+    x = np.select([side == 0, side == 1, side == 2], [0, along * width, width], along * width)
+    y = np.select([side == 0, side == 1, side == 2], [along * height, height, along * height], 0)
+    return np.stack((x, y), axis=1)
+
+
+def test_on_border_matches_scalar():
+    table_dim = Table_Dimention(400, 300)
+    rng = np.random.default_rng(0)
+    border_locations = _get_border_locations(table_dim, 200, rng)
+    locations = np.concatenate((
+        border_locations,
+        # Just off the border, by more and less than the tolerance
+        border_locations + rng.choice([-1, 1], border_locations.shape) * 1e-7,
+        border_locations * (1 + 1e-12),
+        rng.uniform(0, 300, (200, 2)),
+        # Corners
+        [(0, 0), (0, 300), (400, 300), (400, 0)],
+    ))
+
+    recv_on_border = table_dim.on_border_array(locations)
+    exp_on_border = [table_dim.on_border_float(location) for location in locations]
+
+    assert recv_on_border.tolist() == exp_on_border
+
+
+def test_border_positions_match_scalar():
+    table_dim = Table_Dimention(400, 300)
+    rng = np.random.default_rng(1)
+    locations = np.concatenate((
+        _get_border_locations(table_dim, 200, rng),
+        [(0, 0), (0, 300), (400, 300), (400, 0)],
+    ))
+
+    recv_positions = table_dim.get_border_positions(locations)
+    exp_positions = [table_dim.get_border_position(location) for location in locations]
+
+    assert recv_positions.tolist() == exp_positions
+
+
+def test_border_positions_off_border():
+    table_dim = Table_Dimention(400, 300)
+
+    with pytest.raises(Exception):
+        table_dim.get_border_positions(np.array([(0, 10), (10, 10)]))
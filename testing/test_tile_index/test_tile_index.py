@@ -0,0 +1,86 @@
+
+import os
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.tile_index import TileIndex, TILE_INDEX_FILE_NAME
+
+
+def _write_test_tile(file_path, lat, lon, size=11):
+    res = 1 / (size - 1)
+    transform = from_origin(lon - res / 2, lat + 1 + res / 2, res, res)
+    with rasterio.open(file_path, "w", driver="GTiff", height=size, width=size, count=1,
+                       dtype="int16", crs="EPSG:4326", transform=transform) as dst:
+        dst.write(np.ones((size, size), dtype=np.int16), 1)
+    return os.path.abspath(file_path)
+
+
+def _write_test_tiles(tile_dir):
+    return [
+        _write_test_tile(tile_dir / "n44_w072.tif", 44, -72),
+        _write_test_tile(tile_dir / "n44_w071.tif", 44, -71),
+        _write_test_tile(tile_dir / "n43_w072.tif", 43, -72),
+    ]
+
+
+def test_query_single_tile(tmp_path):
+    file_paths = _write_test_tiles(tmp_path)
+    tile_index = TileIndex()
+    tile_index.update(file_paths)
+
+    recv_files = tile_index.query(GeoBoundingBox(44.2, -71.8, 44.5, -71.5))
+
+    assert recv_files == [file_paths[0]]
+
+
+def test_query_keeps_given_order(tmp_path):
+    file_paths = _write_test_tiles(tmp_path)
+    tile_index = TileIndex()
+    tile_index.update(file_paths[::-1])
+
+    recv_files = tile_index.query(GeoBoundingBox(43.9, -71.1, 44.1, -70.9))
+
+    assert recv_files == [file_paths[2], file_paths[1], file_paths[0]]
+
+
+def test_query_no_tiles(tmp_path):
+    file_paths = _write_test_tiles(tmp_path)
+    tile_index = TileIndex()
+    tile_index.update(file_paths)
+
+    recv_files = tile_index.query(GeoBoundingBox(10, 10, 11, 11))
+
+    assert recv_files == []
+
+
+def test_index_is_persisted(tmp_path):
+    file_paths = _write_test_tiles(tmp_path)
+    index_file_path = str(tmp_path / TILE_INDEX_FILE_NAME)
+    tile_index = TileIndex.load(index_file_path)
+    tile_index.update(file_paths)
+    tile_index.save()
+
+    reloaded_index = TileIndex.load(index_file_path)
+    reloaded_index.update(file_paths)
+
+    assert not reloaded_index.modified
+    assert reloaded_index.tiles == tile_index.tiles
+
+
+def test_changed_tile_is_reindexed(tmp_path):
+    file_paths = _write_test_tiles(tmp_path)
+    index_file_path = str(tmp_path / TILE_INDEX_FILE_NAME)
+    tile_index = TileIndex.load(index_file_path)
+    tile_index.update(file_paths)
+    tile_index.save()
+
+    # Replace the first tile with one somewhere else
+    _write_test_tile(tmp_path / "n44_w072.tif", 10, 10)
+    os.utime(file_paths[0], ns=(0, 0))
+
+    reloaded_index = TileIndex.load(index_file_path)
+    reloaded_index.update(file_paths)
+
+    assert reloaded_index.modified
+    assert reloaded_index.query(GeoBoundingBox(10.2, 10.2, 10.5, 10.5)) == [file_paths[0]]
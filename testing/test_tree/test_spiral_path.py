@@ -0,0 +1,66 @@
+import numpy as np
+from src.spacial.table_dimention import Table_Dimention
+from src.contour_calculation.topographic_contours import get_contours
+from src.contour_calculation.loop_closer import merge_all_loop_fragments
+from src.topography_tree.build_topography_tree import build_topography_tree
+from src.topography_tree.tree_elaboration import find_step_transition, generate_tree_spiral_path, iter_tree_spiral_path
+
+
+def _build_test_tree(table_dim):
+    x_grid, y_grid = np.meshgrid(np.linspace(-5, 5, table_dim.get_width_mm()), np.linspace(-5, 5, table_dim.get_height_mm()))
+    # Two hills, so there are loops cut by the border and loops that must be completed
+    elevation_data = (np.exp(-((x_grid - 2) ** 2 + (y_grid - 1) ** 2) / 3) * 300 +
+                      np.exp(-((x_grid + 3) ** 2 + (y_grid + 2) ** 2) / 2) * 200)
+    contour_loops = merge_all_loop_fragments(get_contours(elevation_data, table_dim, 15), table_dim)
+    return build_topography_tree(contour_loops, table_dim)
+
+
+def test_threaded_path_matches_serial():
+    topo_tree = _build_test_tree(Table_Dimention(150, 100))
+
+    expt_path = generate_tree_spiral_path(topo_tree)
+    recv_path = generate_tree_spiral_path(topo_tree, workers=4)
+
+    assert len(expt_path) > 0
+    assert np.array_equal(recv_path, expt_path)
+
+
+def test_transitions_are_independent():
+    topo_tree = _build_test_tree(Table_Dimention(150, 100))
+    traversal_order = topo_tree.unravel_tree()
+    step_pairs = list(zip(traversal_order, traversal_order[1:]))
+
+    expt_transitions = [find_step_transition(step_pair) for step_pair in step_pairs]
+    recv_transitions = [find_step_transition(step_pair) for step_pair in reversed(step_pairs)][::-1]
+
+    assert recv_transitions == expt_transitions
+
+
+def test_path_segments():
+    topo_tree = _build_test_tree(Table_Dimention(150, 100))
+    traversal_order = topo_tree.unravel_tree()
+
+    recv_path, recv_segment_offsets, recv_segment_steps = generate_tree_spiral_path(topo_tree, return_segments=True)
+
+    assert np.array_equal(recv_path, generate_tree_spiral_path(topo_tree))
+    assert recv_segment_offsets[0] == 0 and recv_segment_offsets[-1] == len(recv_path)
+    assert len(recv_segment_steps) == len(recv_segment_offsets) - 1
+    # Steps only go forward, and a step adds at most two parts of its loop
+    assert np.all(np.diff(recv_segment_steps) >= 0)
+    assert np.max(np.bincount(recv_segment_steps)) <= 2
+    for segment_start, segment_stop, step_idx in zip(recv_segment_offsets, recv_segment_offsets[1:], recv_segment_steps):
+        loop_vertices = traversal_order[step_idx][0].get_vertices()
+        segment = recv_path[segment_start:segment_stop]
+        # Each segment runs along its loop, wrapping round at the end
+        start_idx = np.flatnonzero((loop_vertices == segment[0]).all(axis=1))[0]
+        assert np.array_equal(segment, np.roll(loop_vertices, -start_idx, axis=0)[:len(segment)])
+
+
+def test_path_chunks():
+    topo_tree = _build_test_tree(Table_Dimention(150, 100))
+    expt_path = generate_tree_spiral_path(topo_tree)
+
+    for chunk_size in [1, 100, 1000, len(expt_path) + 1]:
+        recv_chunks = list(iter_tree_spiral_path(topo_tree, chunk_size=chunk_size))
+        assert all(len(chunk) == chunk_size for chunk in recv_chunks[:-1])
+        assert np.array_equal(np.concatenate(recv_chunks), expt_path)
@@ -0,0 +1,90 @@
+
+import math
+import numpy as np
+from src.contour_calculation.contour_loop import ContourLoop
+from src.topography_tree.tree_elaboration import find_best_to_point, find_best_to_points, find_best_transition, find_shortest_transition
+
+
+def _find_shortest_transition_brute_force(from_vertices, to_vertices):
+    dists = np.linalg.norm(from_vertices[:, np.newaxis, :] - to_vertices[np.newaxis, :, :], axis=2)
+    return np.unravel_index(np.argmin(dists), dists.shape)
+
+
+def test_shortest_transition():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        from_vertices = rng.uniform(0, 100, (rng.integers(3, 100), 2))
+        to_vertices = rng.uniform(0, 100, (rng.integers(3, 100), 2))
+
+        recv_pair = find_shortest_transition(ContourLoop(from_vertices), ContourLoop(to_vertices))
+
+        assert recv_pair == _find_shortest_transition_brute_force(from_vertices, to_vertices)
+
+
+def test_shortest_transition_ties():
+    # Every vertex of from_loop is 1 away from two vertices of to_loop
+    from_vertices = np.array([(0, 0), (0, 2), (2, 2), (2, 0)], dtype=np.float64)
+    to_vertices = np.array([(1, 2), (1, 0), (3, 0), (3, 2)], dtype=np.float64)
+
+    recv_pair = find_shortest_transition(ContourLoop(from_vertices), ContourLoop(to_vertices))
+
+    assert recv_pair == (0, 1)
+
+
+def test_kd_tree_is_cached():
+    loop = ContourLoop(np.array([(0, 0), (0, 2), (2, 2), (2, 0)], dtype=np.float64))
+
+    assert loop.get_kd_tree() is loop.get_kd_tree()
+
+
+def _find_best_to_point_one_by_one(from_vertices, to_vertices, from_idx):
+    current_point = from_vertices[from_idx]
+    tangent_vector = from_vertices[(from_idx + 1) % len(from_vertices)] - current_point
+    distances = [math.dist(current_point, to_point) for to_point in to_vertices]
+    if math.hypot(*tangent_vector) < 1e-6:
+        best_to_idx = int(np.argmin(distances))
+        return best_to_idx, 1 - min(1, distances[best_to_idx] / 100)
+    tangent_vector = tangent_vector / math.hypot(*tangent_vector)
+    max_distance = max(distances) or 1
+
+    scores = []
+    for to_idx in range(len(to_vertices)):
+        to_dir = to_vertices[(to_idx + 1) % len(to_vertices)] - to_vertices[to_idx]
+        angle_score = 0
+        if math.hypot(*to_dir) > 1e-6:
+            dot_product = np.clip(np.dot(tangent_vector, to_dir / math.hypot(*to_dir)), -1.0, 1.0)
+            angle_score = 1 - (math.acos(dot_product) / math.pi)
+        scores.append(0.5 * (1 - distances[to_idx] / max_distance) + 0.5 * angle_score)
+    best_to_idx = int(np.argmax(scores))
+    return best_to_idx, scores[best_to_idx]
+
+
+def test_best_to_points():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        from_vertices = np.cumsum(rng.normal(size=(rng.integers(5, 60), 2)), axis=0)
+        to_vertices = np.cumsum(rng.normal(size=(rng.integers(5, 60), 2)), axis=0)
+        # A repeated vertex, so a tangent and a to direction are undefined
+        from_vertices[3] = from_vertices[2]
+        to_vertices[1] = to_vertices[0]
+        from_indices = np.arange(len(from_vertices))
+
+        recv_to_indices, recv_scores = find_best_to_points(from_vertices, to_vertices, from_indices)
+
+        for from_idx in from_indices:
+            expt_to_idx, expt_score = _find_best_to_point_one_by_one(from_vertices, to_vertices, from_idx)
+            assert recv_to_indices[from_idx] == expt_to_idx
+            assert math.isclose(recv_scores[from_idx], expt_score, rel_tol=1e-12)
+            assert find_best_to_point(from_vertices, to_vertices, from_idx)[0] == expt_to_idx
+
+
+def test_best_transition_between_circles():
+    angles = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    circle = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+    from_vertices = circle * 50
+    # Turned an eighth of the way round, so the best to point is 25 along
+    to_vertices = np.roll(circle * 60, -25, axis=0)
+
+    recv_from_idx, recv_to_idx = find_best_transition(from_vertices.tolist(), to_vertices.tolist())
+
+    assert (recv_to_idx + 25) % len(to_vertices) == recv_from_idx
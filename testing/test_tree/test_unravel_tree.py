@@ -55,3 +55,40 @@ def test_unravel_deepest_first():
         (0, True),
     ]
     assert recv_traversal == exp_traversal
+
+
+def test_unravel_deep_tree():
+    # Deeper than the recursion limit
+    depth = 5000
+    root = TopographyTreeNode(0)
+    node = root
+    for i in range(1, depth):
+        child = TopographyTreeNode(i)
+        node.add_child(child)
+        node = child
+    recv_traversal = root.unravel_tree()
+    exp_traversal = [(i, True) for i in reversed(range(depth))]
+    assert recv_traversal == exp_traversal
+    assert root.get_max_depth() == depth
+    assert root.get_size() == depth
+
+
+def test_depth_updates_when_child_added():
+    root = TopographyTreeNode(0)
+    child1 = TopographyTreeNode(1)
+    root.add_child(child1)
+    child2 = TopographyTreeNode(2)
+    root.add_child(child2)
+    assert root.get_max_depth() == 2
+    assert root.unravel_tree()[0] == (2, True)
+    # Making the first branch deeper after the depths are known
+    child1.add_child(TopographyTreeNode(3))
+    assert root.get_max_depth() == 3
+    assert root.get_size() == 4
+    assert root.unravel_tree() == [
+        (3, True),
+        (1, True),
+        (0, False),
+        (2, True),
+        (0, True),
+    ]
@@ -0,0 +1,75 @@
+
+import math
+import geopandas as gpd
+from pyproj import Geod
+from shapely.geometry import LineString, Polygon
+from src.spacial.geo_coord_sys import GeoBoundingBox
+from src.geography_input.water_extraction import get_lakes_with_area
+from src.geography_input.water_store import build_water_store, read_water_store
+
+
+def _square(lon, lat, size=0.01):
+    return Polygon([(lon, lat), (lon + size, lat), (lon + size, lat + size), (lon, lat + size)])
+
+
+def _write_test_source(file_path):
+    source_gdf = gpd.GeoDataFrame(
+        {
+            "natural": ["water", "water", "water", "wood"],
+            "water": ["lake", "river", "pond", None],
+            "waterway": [None, "river", None, None],
+            "name": ["Near Lake", "Near River", "Far Pond", "Near Wood"],
+        },
+        geometry=[
+            _square(-71.83, 44.01),
+            LineString([(-71.84, 44.01), (-71.82, 44.03)]),
+            _square(-60.0, 40.0),
+            _square(-71.82, 44.02),
+        ],
+        crs="EPSG:4326",
+    )
+    source_gdf.to_file(file_path, driver="GeoJSON")
+    return str(file_path)
+
+
+def test_store_only_keeps_water(tmp_path):
+    source_path = _write_test_source(tmp_path / "source.geojson")
+    store_path = str(tmp_path / "water.gpkg")
+
+    build_water_store(source_path, store_path)
+    water_gdf = read_water_store(store_path, GeoBoundingBox(-90, -180, 90, 180))
+
+    assert sorted(water_gdf["name"]) == ["Far Pond", "Near Lake", "Near River"]
+
+
+def test_store_bbox_query(tmp_path):
+    source_path = _write_test_source(tmp_path / "source.geojson")
+    store_path = str(tmp_path / "water.gpkg")
+
+    build_water_store(source_path, store_path)
+    water_gdf = read_water_store(store_path, GeoBoundingBox(44.0, -71.85, 44.05, -71.8))
+
+    assert sorted(water_gdf["name"]) == ["Near Lake", "Near River"]
+
+
+def test_lakes_from_store(tmp_path):
+    source_path = _write_test_source(tmp_path / "source.geojson")
+    store_path = str(tmp_path / "water.gpkg")
+
+    build_water_store(source_path, store_path)
+    lakes_gdf = get_lakes_with_area(GeoBoundingBox(44.0, -71.85, 44.05, -71.8), water_store_path=store_path)
+
+    assert list(lakes_gdf["name"]) == ["Near Lake"]
+    assert lakes_gdf.crs == "EPSG:4326"
+
+
+def test_lake_area(tmp_path):
+    source_path = _write_test_source(tmp_path / "source.geojson")
+    store_path = str(tmp_path / "water.gpkg")
+
+    build_water_store(source_path, store_path)
+    lakes_gdf = get_lakes_with_area(GeoBoundingBox(44.0, -71.85, 44.05, -71.8), water_store_path=store_path)
+
+    # Geodesic area of the lake
+    exp_area_m2, _ = Geod(ellps="WGS84").geometry_area_perimeter(_square(-71.83, 44.01))
+    assert math.isclose(lakes_gdf["area_km2"].iloc[0], abs(exp_area_m2) / 1000000, rel_tol=1e-4)